@@ -0,0 +1,81 @@
+# benchmarks/bulk_import.py
+"""Rows/sec for the bulk CSV import and export.
+
+    python -m benchmarks.bulk_import --rows 1000000
+
+Writes a synthetic catalog CSV, imports it into a throwaway SQLite file
+(search index and facet triggers included), then streams it back out.
+Prints the timings as JSON.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+
+from server.app import create_app
+from server.bulk import IMPORT_BATCH_SIZE, import_products, iter_csv, read_csv
+from server.models import db
+
+WORDS = ["wireless", "gaming", "mouse", "keyboard", "laptop", "stand", "cable", "usb",
+         "monitor", "headset", "mechanical", "portable", "charger", "dock", "webcam"]
+
+
+def write_catalog(path, rows, rng):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "price", "stock", "category", "brand", "description"])
+        for i in range(rows):
+            writer.writerow([
+                f"{' '.join(rng.sample(WORDS, 3)).title()} {i}",
+                rng.randint(1, 2000),
+                rng.randint(0, 100),
+                rng.choice(WORDS[:5]),
+                rng.choice(WORDS[5:]),
+                " ".join(rng.choices(WORDS, k=10)),
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    catalog = os.path.join(workdir, "catalog.csv")
+    path = os.path.join(workdir, "bench.db")
+    write_catalog(catalog, args.rows, random.Random(42))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SECRET_KEY": "benchmark"})
+    try:
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            with open(catalog, encoding="utf-8", newline="") as f:
+                summary = import_products(read_csv(f), args.batch_size)
+            import_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            exported = sum(len(chunk) for chunk in iter_csv())
+            export_seconds = time.perf_counter() - start
+        print(json.dumps({
+            "rows": args.rows,
+            "inserted": summary["inserted"],
+            "import_seconds": round(import_seconds, 1),
+            "import_rows_per_sec": round(summary["inserted"] / import_seconds),
+            "export_seconds": round(export_seconds, 1),
+            "export_rows_per_sec": round(args.rows / export_seconds),
+            "export_bytes": exported,
+        }, indent=2))
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/http_load.py
+"""Latency under many concurrent connections against a running server.
+
+    SECRET_KEY=bench DATABASE_URL=sqlite:////tmp/bench.db uvicorn server.asgi:app --workers 4 &
+    python -m benchmarks.http_load http://127.0.0.1:8000/products --concurrency 500
+
+Every request opens its own connection, so ``--concurrency`` is the number of
+sockets open at once. Prints throughput and p50/p95/p99 latency as JSON.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda s: round(s * 1000, 2) if s is not None else None
+    return {
+        "requests": sum(statuses.values()),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+async def fetch(host, port, path, method="GET", body=None, headers=None):
+    """One HTTP/1.1 request on a fresh connection; returns the status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: close"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+        response = await reader.read()
+        return int(response.split(b" ", 2)[1])
+    finally:
+        writer.close()
+
+
+async def load(url, concurrency, total):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+
+    async def one():
+        async with slots:
+            start = time.perf_counter()
+            try:
+                status = await fetch(parts.hostname, parts.port or 80, path)
+            except (OSError, IndexError, ValueError):
+                statuses["error"] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    result = asyncio.run(load(args.url, args.concurrency, args.requests))
+    print(json.dumps({"url": args.url, "concurrency": args.concurrency, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
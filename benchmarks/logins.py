@@ -0,0 +1,71 @@
+# benchmarks/logins.py
+"""Logins/sec through POST /login with the bcrypt process pool.
+
+    python -m benchmarks.logins --workers 4 --threads 16 --rounds 10
+    python -m benchmarks.logins --workers 0   # hash on the request thread
+
+Runs against a throwaway SQLite file; store.db is never touched.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from server.app import create_app
+from server.models import db, User
+from server.passwords import password_hasher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SECRET_KEY": "benchmark",
+        "BCRYPT_LOG_ROUNDS": args.rounds,
+        "PASSWORD_POOL_WORKERS": args.workers,
+        "PASSWORD_POOL_QUEUE": args.threads * 2,
+    })
+    try:
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username="bench", email="bench@example.com", password="password"))
+            db.session.commit()
+
+        statuses = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def worker():
+            client = app.test_client()
+            while time.perf_counter() < deadline:
+                status = client.post("/login", json={"username": "bench", "password": "password"}).status_code
+                with lock:
+                    statuses[status] += 1
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        print(f"workers={args.workers} threads={args.threads} rounds={args.rounds}")
+        print(f"  {statuses[200] / elapsed:,.1f} logins/sec  statuses={dict(statuses)}")
+    finally:
+        password_hasher.shutdown()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/search.py
+"""Search latency over a synthetic catalog: FTS5 index vs LIKE scan.
+
+    python -m benchmarks.search --products 1000000 --queries 2000
+
+Seeds a throwaway SQLite file with products named from a random vocabulary,
+then times ``search_products`` for single words, short prefixes and two-word
+queries. A handful of the same queries are also run as the LIKE filter a
+client would otherwise need. Prints p50/p95/p99 per query kind as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from sqlalchemy import insert, or_
+
+from benchmarks.http_load import percentile
+from server.app import create_app
+from server.models import db, Product
+from server.search import search_products
+
+SEED_BATCH = 20_000
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))))
+    return sorted(words)
+
+
+def seed(products, words, rng):
+    categories = words[:30]
+    brands = words[30:230]
+    for start in range(0, products, SEED_BATCH):
+        db.session.execute(insert(Product), [
+            {
+                "name": " ".join(rng.sample(words, 3)).title(),
+                "description": " ".join(rng.choices(words, k=12)),
+                "brand": rng.choice(brands).title(),
+                "category": rng.choice(categories),
+                "price": rng.randint(1, 2000),
+                "stock": 100,
+            }
+            for _ in range(start, min(start + SEED_BATCH, products))
+        ])
+        db.session.commit()
+
+
+def time_queries(queries, run):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        run(q)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "queries": len(queries),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+    }
+
+
+def like_scan(q):
+    pattern = f"%{q}%"
+    return (
+        Product.query.with_entities(Product.id, Product.name)
+        .filter(or_(Product.name.ilike(pattern), Product.description.ilike(pattern),
+                    Product.brand.ilike(pattern), Product.category.ilike(pattern)))
+        .limit(50)
+        .all()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--like-queries", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = vocabulary(args.vocabulary, rng)
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SECRET_KEY": "benchmark", "CATALOG_CACHE_ENABLED": False})
+    try:
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            seed(args.products, words, rng)
+            seed_seconds = time.perf_counter() - start
+
+            kinds = {
+                "word": [rng.choice(words) for _ in range(args.queries)],
+                "prefix": [rng.choice(words)[:3] for _ in range(args.queries)],
+                "two_words": [" ".join(rng.sample(words, 2)) for _ in range(args.queries)],
+            }
+            results = {
+                kind: time_queries(queries, lambda q: search_products({"q": q, "fields": "id,name"}))
+                for kind, queries in kinds.items()
+            }
+            results["like_scan"] = time_queries(kinds["word"][:args.like_queries], like_scan)
+        print(json.dumps({
+            "products": args.products,
+            "seed_seconds": round(seed_seconds, 1),
+            **results,
+        }, indent=2))
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/serialization.py
+"""Rows/sec for the old to_dict() + json path vs projected rows + fast dumps.
+
+    python -m benchmarks.serialization --rows 20000
+
+Runs against a throwaway SQLite file; store.db is never touched.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+
+from server.app import create_app
+from server.listing import product_query
+from server.models import db, User, Product, CartItem, Order, OrderItem, order_history, cart_contents
+from server.serializers import BACKEND, dumps, row_dict
+
+
+def seed(rows):
+    user = User(username="bench", email="bench@example.com", password="password")
+    db.session.add(user)
+    db.session.flush()
+    db.session.execute(insert(Product), [
+        {"name": f"Product {i}", "price": 1 + i % 500, "category": f"Category {i % 20}",
+         "brand": f"Brand {i % 50}", "description": "x" * 80, "stock": 100}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(CartItem), [
+        {"user_id": user.id, "product_id": i + 1, "quantity": 1} for i in range(rows)
+    ])
+    db.session.execute(insert(Order), [{"user_id": user.id, "total": 3.0} for _ in range(rows)])
+    db.session.execute(insert(OrderItem), [
+        {"order_id": i + 1, "product_id": i + 1, "quantity": 3, "price": 1.0} for i in range(rows)
+    ])
+    db.session.commit()
+    return user.id
+
+
+def timed(label, rows, fn):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<8} {rows / elapsed:>12,.0f} rows/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SECRET_KEY": "benchmark"})
+    try:
+        with app.app_context():
+            db.create_all()
+            user_id = seed(args.rows)
+            n = args.rows
+            print(f"serializer backend: {BACKEND}")
+
+            print("Product")
+            timed("before", n, lambda: json.dumps([p.to_dict() for p in Product.query.all()], sort_keys=True))
+            query, fields, _ = product_query({})
+            timed("after", n, lambda: dumps([row_dict(r, fields) for r in query.all()]))
+
+            print("CartItem")
+            timed("before", n, lambda: json.dumps(
+                [c.to_dict() for c in CartItem.query.options(selectinload(CartItem.product))
+                 .filter_by(user_id=user_id)], sort_keys=True))
+            timed("after", n, lambda: dumps(list(cart_contents(user_id))))
+
+            print("Order")
+            timed("before", n, lambda: json.dumps(
+                [o.to_dict() for o in Order.query.options(
+                    selectinload(Order.items).selectinload(OrderItem.product))
+                 .filter_by(user_id=user_id)], sort_keys=True))
+            timed("after", n, lambda: dumps(list(order_history(user_id))))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
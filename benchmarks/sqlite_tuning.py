@@ -0,0 +1,103 @@
+# benchmarks/sqlite_tuning.py
+"""Mixed read/write throughput with default vs tuned SQLite settings.
+
+    python -m benchmarks.sqlite_tuning --readers 8 --writers 4 --seconds 5
+
+"default" turns off the connect PRAGMAs and lock retries; "tuned" uses the
+app's defaults (WAL, synchronous=NORMAL, busy timeout, retries). Each run
+gets its own throwaway database file.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import insert
+
+from server.app import create_app
+from server.models import db, User, Product
+
+CONFIGS = {
+    "default": {"SQLITE_PRAGMAS": {}, "DB_LOCK_RETRIES": 0},
+    "tuned": {},
+}
+
+
+def run(name, overrides, args):
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SECRET_KEY": "benchmark",
+        "PASSWORD_POOL_WORKERS": 0,
+        "BCRYPT_LOG_ROUNDS": 4,
+        "CATALOG_CACHE_ENABLED": False,
+        **overrides,
+    })
+    try:
+        with app.app_context():
+            db.create_all()
+            db.session.execute(insert(Product), [
+                {"name": f"Product {i}", "price": 10, "stock": 1_000_000} for i in range(args.products)
+            ])
+            db.session.add_all([
+                User(username=f"user{i}", email=f"user{i}@example.com", password="pw")
+                for i in range(args.writers)
+            ])
+            db.session.commit()
+
+        counts = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def reader():
+            client = app.test_client()
+            while time.perf_counter() < deadline:
+                status = client.get(f"/products/{random.randint(1, args.products)}").status_code
+                with lock:
+                    counts["read" if status == 200 else f"read_{status}"] += 1
+
+        def writer(i):
+            client = app.test_client()
+            while time.perf_counter() < deadline:
+                client.post("/cart", json={"username": f"user{i}", "product_id": random.randint(1, args.products)})
+                status = client.post(f"/checkout/user{i}").status_code
+                with lock:
+                    counts["write" if status == 201 else f"write_{status}"] += 1
+
+        threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        errors = {k: v for k, v in counts.items() if k not in ("read", "write")}
+        print(f"{name:<8} reads/sec {counts['read'] / elapsed:>9,.1f}   "
+              f"checkouts/sec {counts['write'] / elapsed:>8,.1f}   errors {errors}")
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    for name, overrides in CONFIGS.items():
+        run(name, overrides, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/stock_contention.py
+"""Concurrent buyers of one hot product, with and without sharded stock.
+
+    python -m benchmarks.stock_contention --buyers 200 --orders 5 --shards 8
+
+Every buyer is a thread placing ``--orders`` single-unit orders for the same
+product through POST /orders, all released at once. The run is repeated with
+the product's stock in one row and split over ``--shards`` counter rows, on
+a throwaway SQLite file each time. Prints throughput, p50/p95/p99 and a
+consistency check (units sold vs. stock left) per mode as JSON.
+
+Pass ``--stock`` below buyers x orders to also check that a sell-out never
+oversells.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func, insert
+
+from benchmarks.http_load import summarize
+from server.app import create_app
+from server.models import db, User, Product, OrderItem
+from server.passwords import password_hasher
+from server.stock_shards import shard_product, shard_totals
+
+
+def run(path, buyers, orders, stock, shards):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SECRET_KEY": "benchmark",
+        "STOCK_SHARDING_ENABLED": True,
+        "BCRYPT_LOG_ROUNDS": 4,
+        "PASSWORD_POOL_WORKERS": 0,
+    })
+    with app.app_context():
+        db.create_all()
+        password_hash = password_hasher.hash("password")
+        db.session.execute(insert(User), [
+            {"username": f"buyer{i}", "email": f"buyer{i}@example.com", "_password_hash": password_hash}
+            for i in range(buyers)
+        ])
+        product = Product(name="Flash sale console", price=299, stock=stock)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+        if shards > 1:
+            shard_product(product_id, shards)
+
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(buyers)
+
+    def buyer(index):
+        client = app.test_client()
+        body = {"username": f"buyer{index}", "items": [{"product_id": product_id, "quantity": 1}]}
+        barrier.wait()
+        for _ in range(orders):
+            start = time.perf_counter()
+            response = client.post("/orders", json=body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(buyers)]
+    for t in threads:
+        t.start()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+        left = shard_totals([product_id]).get(product_id, db.session.get(Product, product_id).stock)
+        db.engine.dispose()
+    result = summarize(latencies, statuses, elapsed)
+    result.update({
+        "shards": shards,
+        "sold": sold,
+        "stock_left": left,
+        "consistent": sold + left == stock and left >= 0,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=5, help="orders per buyer")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--stock", type=int, help="initial stock (default: enough for every order)")
+    args = parser.parse_args()
+    stock = args.stock if args.stock is not None else args.buyers * args.orders
+
+    results = {}
+    for mode, shards in (("single_row", 1), ("sharded", args.shards)):
+        workdir = tempfile.mkdtemp()
+        path = os.path.join(workdir, "bench.db")
+        try:
+            results[mode] = run(path, args.buyers, args.orders, stock, shards)
+        finally:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            os.rmdir(workdir)
+    print(json.dumps({"buyers": args.buyers, "orders_per_buyer": args.orders, "stock": stock, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
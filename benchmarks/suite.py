@@ -0,0 +1,324 @@
+# benchmarks/suite.py
+"""Seed a synthetic store and replay realistic traffic mixes against it.
+
+Seed once, then run a mix through the Flask test client or against a real
+server started on the same database:
+
+    python -m benchmarks.suite seed --db /tmp/bench.db --products 100000 --users 1000 --orders 20000
+    python -m benchmarks.suite run --db /tmp/bench.db --mix mixed --threads 8 --seconds 20
+
+    SECRET_KEY=bench DATABASE_URL=sqlite:////tmp/bench.db uvicorn server.asgi:app --workers 4 &
+    python -m benchmarks.suite run --db /tmp/bench.db --mix mixed --url http://127.0.0.1:8000 --concurrency 64
+
+Each run prints one JSON document with throughput and p50/p95/p99 latency
+overall and per request type, plus the commit it ran against, so runs can
+be diffed across commits. Seeded users all have the password "password".
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy import func, insert
+
+from benchmarks.http_load import fetch, summarize
+from server.app import create_app
+from server.bulk import import_products
+from server.models import db, User, Product, Order, OrderItem
+from server.passwords import password_hasher
+
+SEED_BATCH = 20_000
+WORDS = ["wireless", "gaming", "mouse", "keyboard", "laptop", "stand", "cable", "usb", "monitor",
+         "headset", "mechanical", "portable", "charger", "dock", "webcam", "speaker", "ssd", "hub"]
+CATEGORIES = ["Accessories", "Audio", "Computers", "Storage", "Networking", "Displays"]
+BRANDS = ["Razor", "Sony", "Corsair", "Logitech", "ASUS", "Apple", "Anker", "BenQ", "MSI", "Intel"]
+
+
+def product_price(product_id):
+    """Seeded prices are a function of the id, so order totals can be computed."""
+    return float(5 + product_id % 1000)
+
+
+# -------------------- Seeding --------------------
+def seed(products, users, orders, rng):
+    def catalog():
+        for i in range(products):
+            yield i, {
+                "name": f"{' '.join(rng.sample(WORDS, 3)).title()} {i}",
+                "price": product_price(i + 1),
+                "stock": 1_000_000,
+                "category": rng.choice(CATEGORIES),
+                "brand": rng.choice(BRANDS),
+                "description": " ".join(rng.choices(WORDS, k=12)),
+            }
+
+    import_products(catalog())
+
+    # One hash shared by every user; hashing a million passwords is not the point
+    password_hash = password_hasher.hash("password")
+    for start in range(0, users, SEED_BATCH):
+        db.session.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "_password_hash": password_hash}
+            for i in range(start, min(start + SEED_BATCH, users))
+        ])
+    db.session.commit()
+
+    order_id = 0
+    for start in range(0, orders, SEED_BATCH):
+        order_rows, item_rows = [], []
+        for _ in range(start, min(start + SEED_BATCH, orders)):
+            order_id += 1
+            lines = {rng.randint(1, products): rng.randint(1, 3) for _ in range(rng.randint(1, 4))}
+            order_rows.append({
+                "id": order_id,
+                "user_id": rng.randint(1, users),
+                "total": sum(product_price(pid) * qty for pid, qty in lines.items()),
+            })
+            item_rows += [
+                {"order_id": order_id, "product_id": pid, "quantity": qty, "price": product_price(pid)}
+                for pid, qty in lines.items()
+            ]
+        db.session.execute(insert(Order), order_rows)
+        db.session.execute(insert(OrderItem), item_rows)
+        db.session.commit()
+
+
+# -------------------- Traffic --------------------
+# An operation yields the requests it makes, in order, as
+# (label, method, path, json body)
+def browse_list(rng, scale):
+    sort = rng.choice(["created_at", "-created_at", "price", "-price"])
+    yield "list", "GET", f"/products?limit=50&sort={sort}", None
+
+
+def browse_filtered(rng, scale):
+    yield "list_filtered", "GET", f"/products?category={rng.choice(CATEGORIES)}&limit=50", None
+
+
+def browse_detail(rng, scale):
+    yield "detail", "GET", f"/products/{rng.randint(1, scale['products'])}", None
+
+
+def browse_search(rng, scale):
+    yield "search", "GET", f"/products/search?q={rng.choice(WORDS)[:4]}&limit=20", None
+
+
+def browse_facets(rng, scale):
+    yield "facets", "GET", "/products/facets", None
+
+
+def add_to_cart(rng, scale):
+    username = f"user{rng.randrange(scale['users'])}"
+    body = {"username": username, "product_id": rng.randint(1, scale["products"]), "quantity": 1}
+    yield "add_to_cart", "POST", "/cart", body
+
+
+def view_cart(rng, scale):
+    yield "view_cart", "GET", f"/cart/user{rng.randrange(scale['users'])}", None
+
+
+def checkout(rng, scale):
+    username = f"user{rng.randrange(scale['users'])}"
+    for _ in range(rng.randint(1, 3)):
+        body = {"username": username, "product_id": rng.randint(1, scale["products"]), "quantity": 1}
+        yield "add_to_cart", "POST", "/cart", body
+    yield "checkout", "POST", f"/checkout/{username}", None
+
+
+def order_history(rng, scale):
+    yield "order_history", "GET", f"/orders/user{rng.randrange(scale['users'])}", None
+
+
+MIXES = {
+    "browse": {browse_list: 40, browse_filtered: 15, browse_detail: 30, browse_search: 10, browse_facets: 5},
+    "cart": {add_to_cart: 60, view_cart: 40},
+    "checkout": {checkout: 100},
+    "history": {order_history: 100},
+    "mixed": {
+        browse_list: 25, browse_filtered: 10, browse_detail: 25, browse_search: 8, browse_facets: 2,
+        add_to_cart: 12, view_cart: 6, checkout: 4, order_history: 8,
+    },
+}
+
+
+def pick(mix, rng):
+    ops = list(mix)
+    return rng.choices(ops, weights=[mix[op] for op in ops])[0]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, label, status, elapsed):
+        with self.lock:
+            if elapsed is not None:
+                self.latencies[label].append(elapsed)
+            self.statuses[label][status] += 1
+
+    def report(self, elapsed):
+        per_label = {
+            label: summarize(self.latencies[label], self.statuses[label], elapsed)
+            for label in sorted(self.statuses)
+        }
+        everything = [value for values in self.latencies.values() for value in values]
+        statuses = sum(self.statuses.values(), Counter())
+        return {"overall": summarize(everything, statuses, elapsed), "requests": per_label}
+
+
+def run_test_client(app, mix, scale, threads, seconds, seed_value):
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        rng = random.Random(seed_value + index)
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            for label, method, path, body in pick(mix, rng)(rng, scale):
+                start = time.perf_counter()
+                response = client.open(path, method=method, json=body)
+                response.close()
+                recorder.record(label, response.status_code, time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return recorder.report(time.perf_counter() - start)
+
+
+async def run_http(host, port, mix, scale, concurrency, seconds, seed_value):
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+
+    async def worker(index):
+        rng = random.Random(seed_value + index)
+        while time.perf_counter() < deadline:
+            for label, method, path, body in pick(mix, rng)(rng, scale):
+                start = time.perf_counter()
+                try:
+                    status = await fetch(host, port, path, method, body)
+                except (OSError, IndexError, ValueError):
+                    recorder.record(label, "error", None)
+                    continue
+                recorder.record(label, status, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return recorder.report(time.perf_counter() - start)
+
+
+# -------------------- CLI --------------------
+def _app(db_path, **config):
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(db_path)}",
+        "SECRET_KEY": "benchmark",
+        "BCRYPT_LOG_ROUNDS": 4,
+        "PASSWORD_POOL_WORKERS": 0,
+        **config,
+    })
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_command(args):
+    if os.path.exists(args.db):
+        raise SystemExit(f"{args.db} already exists; seed into a fresh file")
+    app = _app(args.db)
+    start = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        seed(args.products, args.users, args.orders, random.Random(args.seed))
+        db.engine.dispose()
+    print(json.dumps({
+        "db": args.db,
+        "products": args.products,
+        "users": args.users,
+        "orders": args.orders,
+        "seed_seconds": round(time.perf_counter() - start, 1),
+    }, indent=2))
+
+
+def run_command(args):
+    app = _app(args.db, CART_STORE=args.cart_store)
+    with app.app_context():
+        scale = {
+            "products": db.session.query(func.max(Product.id)).scalar() or 0,
+            "users": db.session.query(func.count(User.id)).scalar() or 0,
+        }
+    if not scale["products"] or not scale["users"]:
+        raise SystemExit(f"{args.db} has no seeded data; run the seed command first")
+
+    mix = MIXES[args.mix]
+    if args.url:
+        from urllib.parse import urlsplit
+        parts = urlsplit(args.url)
+        driver = {"driver": "http", "url": args.url, "concurrency": args.concurrency}
+        result = asyncio.run(run_http(
+            parts.hostname, parts.port or 80, mix, scale, args.concurrency, args.seconds, args.seed
+        ))
+    else:
+        driver = {"driver": "test_client", "threads": args.threads, "cart_store": args.cart_store}
+        result = run_test_client(app, mix, scale, args.threads, args.seconds, args.seed)
+
+    document = {
+        "commit": _commit(),
+        "mix": args.mix,
+        "seconds": args.seconds,
+        "scale": scale,
+        **driver,
+        **result,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Create and fill a benchmark database.")
+    seed_parser.add_argument("--db", required=True)
+    seed_parser.add_argument("--products", type=int, default=10_000)
+    seed_parser.add_argument("--users", type=int, default=1_000)
+    seed_parser.add_argument("--orders", type=int, default=10_000)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.set_defaults(handler=seed_command)
+
+    run_parser = commands.add_parser("run", help="Replay a traffic mix.")
+    run_parser.add_argument("--db", required=True)
+    run_parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    run_parser.add_argument("--seconds", type=float, default=10)
+    run_parser.add_argument("--threads", type=int, default=8, help="test client threads")
+    run_parser.add_argument("--url", help="run against this server instead of the test client")
+    run_parser.add_argument("--concurrency", type=int, default=64, help="connections for --url")
+    run_parser.add_argument("--cart-store", default="sql", help="CART_STORE for the test client")
+    run_parser.add_argument("--output", help="also write the JSON result here")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.set_defaults(handler=run_command)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
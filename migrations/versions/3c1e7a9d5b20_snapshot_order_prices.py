@@ -0,0 +1,49 @@
+"""Snapshot unit price on order_items and total on orders
+
+Revision ID: 3c1e7a9d5b20
+Revises: 538f40a41af6
+Create Date: 2026-10-18 09:12:41.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e7a9d5b20'
+down_revision = '538f40a41af6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price', sa.Float(), nullable=True))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total', sa.Float(), nullable=True))
+
+    # Existing orders get the current product price as their snapshot
+    op.execute(
+        "UPDATE order_items SET price = "
+        "(SELECT products.price FROM products WHERE products.id = order_items.product_id)"
+    )
+    op.execute(
+        "UPDATE orders SET total = COALESCE("
+        "(SELECT SUM(order_items.price * order_items.quantity) FROM order_items "
+        "WHERE order_items.order_id = orders.id), 0)"
+    )
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.alter_column('price', existing_type=sa.Float(), nullable=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.alter_column('total', existing_type=sa.Float(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('total')
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('price')
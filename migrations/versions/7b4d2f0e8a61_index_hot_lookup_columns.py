@@ -0,0 +1,61 @@
+"""Index hot lookup columns and make cart lines unique per product
+
+Revision ID: 7b4d2f0e8a61
+Revises: 3c1e7a9d5b20
+Create Date: 2026-10-18 10:03:27.114902
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4d2f0e8a61'
+down_revision = '3c1e7a9d5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fold duplicate cart lines into the oldest row before adding the constraint
+    op.execute(
+        "UPDATE cart_items SET quantity = ("
+        "SELECT SUM(c2.quantity) FROM cart_items c2 "
+        "WHERE c2.user_id = cart_items.user_id AND c2.product_id = cart_items.product_id) "
+        "WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)"
+    )
+    op.execute(
+        "DELETE FROM cart_items "
+        "WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)"
+    )
+
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_cart_items_user_id_product_id', ['user_id', 'product_id'])
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index('ix_order_items_order_id_product_id', ['order_id', 'product_id'], unique=False)
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_products_brand'), ['brand'], unique=False)
+        batch_op.create_index(batch_op.f('ix_products_category'), ['category'], unique=False)
+        batch_op.create_index(batch_op.f('ix_products_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_products_price'), ['price'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_products_price'))
+        batch_op.drop_index(batch_op.f('ix_products_created_at'))
+        batch_op.drop_index(batch_op.f('ix_products_category'))
+        batch_op.drop_index(batch_op.f('ix_products_brand'))
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_items_order_id_product_id')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_orders_user_id'))
+
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cart_items_user_id_product_id', type_='unique')
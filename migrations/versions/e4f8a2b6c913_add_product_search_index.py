@@ -0,0 +1,56 @@
+"""Add products_fts full-text index with sync triggers
+
+Revision ID: e4f8a2b6c913
+Revises: c58e19f3a7d4
+Create Date: 2026-10-18 13:42:10.508216
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f8a2b6c913'
+down_revision = 'c58e19f3a7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases are left without a search index
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE products_fts USING fts5("
+        "name, description, brand, category, "
+        "content='products', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts (rowid, name, description, brand, category) "
+        "VALUES (new.id, new.name, new.description, new.brand, new.category); END"
+    )
+    op.execute(
+        "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts (products_fts, rowid, name, description, brand, category) "
+        "VALUES ('delete', old.id, old.name, old.description, old.brand, old.category); END"
+    )
+    op.execute(
+        "CREATE TRIGGER products_fts_update "
+        "AFTER UPDATE OF name, description, brand, category ON products BEGIN "
+        "INSERT INTO products_fts (products_fts, rowid, name, description, brand, category) "
+        "VALUES ('delete', old.id, old.name, old.description, old.brand, old.category); "
+        "INSERT INTO products_fts (rowid, name, description, brand, category) "
+        "VALUES (new.id, new.name, new.description, new.brand, new.category); END"
+    )
+    # Index the existing catalog
+    op.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute("DROP TRIGGER IF EXISTS products_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_insert")
+    op.execute("DROP TABLE IF EXISTS products_fts")
@@ -1,38 +1,183 @@
 # server/app.py
-from flask import Flask, jsonify, request
+from flask import Flask, abort, jsonify, request, stream_with_context
 from flask_cors import CORS
-from .models import db, bcrypt, User, Product, CartItem, Order, OrderItem
+from .models import db, Product, Order, OrderItem, order_history
+from .listing import list_products, stream_products, product_detail, ListingError
+from .search import search_products
+from .facets import facet_counts
+from .bulk import (
+    EXPORTERS, MIMETYPES, READERS, BulkError, format_for, import_products, products_cli,
+)
+from .checkout import checkout_cart, place_order, parse_order_lines, CheckoutError
+from .cart import CartError, parse_quantity
+from .cart_store import cart_store
+from .reservations import reservations
+from .cache import catalog_cache, listing_key
+from .versions import conditional
+from .streaming import stream_json, BATCH_SIZE
+from .serializers import FastJSONProvider
+from .passwords import password_hasher, PoolSaturated
+from .metrics import metrics, record_rows
+from .database import configure_engine, install_pragmas, retry_on_locked
+from .routing import install_sticky_cookie, read_only
+from .idempotency import idempotent, REPLAYED_HEADER
 from flask_migrate import Migrate
-from server.auth import auth_bp
+from server.auth import auth_bp, resolve_user_id
+import io
 import os
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     # -------------------- Database --------------------
     basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(basedir, 'store.db')}"
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "DATABASE_URL", f"sqlite:///{os.path.join(basedir, 'store.db')}"
+    )
+    app.config["DATABASE_REPLICA_URLS"] = [
+        url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    app.config["REPLICA_STICKY_SECONDS"] = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY")
+    app.config["TOKEN_MAX_AGE"] = int(os.environ.get("TOKEN_MAX_AGE", 86400))
+    app.config["CART_STORE"] = os.environ.get("CART_STORE", "sql")
+    if "CART_REDIS_URL" in os.environ:
+        app.config["CART_REDIS_URL"] = os.environ["CART_REDIS_URL"]
+    app.config["RESERVATIONS_ENABLED"] = os.environ.get("RESERVATIONS_ENABLED", "").lower() in ("1", "true")
+    app.config["IDEMPOTENCY_TTL"] = int(os.environ.get("IDEMPOTENCY_TTL", 86400))
+    app.config["IDEMPOTENCY_LEASE"] = int(os.environ.get("IDEMPOTENCY_LEASE", 60))
+    app.config["STOCK_SHARDING_ENABLED"] = os.environ.get("STOCK_SHARDING_ENABLED", "").lower() in ("1", "true")
+    if test_config:
+        app.config.update(test_config)
+    # Access tokens and the primary-sticky cookie are signed with it
+    if not app.config["SECRET_KEY"]:
+        if not (app.debug or app.testing):
+            raise RuntimeError("SECRET_KEY must be set outside debug and testing")
+        app.config["SECRET_KEY"] = "dev"
+
+    configure_engine(app)
     db.init_app(app)
+    install_pragmas(app)
+    install_sticky_cookie(app)
     Migrate(app, db)
-    CORS(app)
+    catalog_cache.init_app(app)
+    password_hasher.init_app(app)
+    cart_store.init_app(app)
+    reservations.init_app(app)  # wraps the cart store
+    metrics.init_app(app)
+    CORS(app, expose_headers=["X-Next-Cursor", "ETag", REPLAYED_HEADER])
 
     # -------------------- Blueprints --------------------
     app.register_blueprint(auth_bp)
+    app.cli.add_command(products_cli)
+
+    @app.errorhandler(PoolSaturated)
+    def password_pool_saturated(e):
+        db.session.rollback()
+        response = jsonify({"error": "Server busy, please retry"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
 
     # -------------------- Products --------------------
     @app.route("/products", methods=["GET"])
+    @read_only
     def get_products():
-        return jsonify([p.to_dict() for p in Product.query.all()])
+        etag, version, not_modified = conditional("products")
+        if not_modified:
+            return not_modified
+
+        # ?stream=true exports every matching product instead of one page
+        if request.args.get("stream", "").lower() in ("1", "true"):
+            try:
+                items = stream_products(request.args, BATCH_SIZE)
+            except ListingError as e:
+                return jsonify({"error": str(e)}), 400
+            response = stream_json(items)
+            response.set_etag(etag)
+            return response
+
+        key = listing_key(request.args)
+        page = catalog_cache.get_listing(key, version)
+        if page is None:
+            try:
+                items, next_cursor = list_products(request.args)
+            except ListingError as e:
+                return jsonify({"error": str(e)}), 400
+            record_rows(len(items))
+            page = (app.json.dumps(items), next_cursor)
+            catalog_cache.set_listing(key, version, page)
+
+        body, next_cursor = page
+        response = app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    @app.route("/products/search", methods=["GET"])
+    @read_only
+    def search():
+        etag, version, not_modified = conditional("products")
+        if not_modified:
+            return not_modified
+
+        key = ("search",) + listing_key(request.args)
+        page = catalog_cache.get_listing(key, version)
+        if page is None:
+            try:
+                items, next_cursor = search_products(request.args)
+            except ListingError as e:
+                return jsonify({"error": str(e)}), 400
+            record_rows(len(items))
+            page = (app.json.dumps(items), next_cursor)
+            catalog_cache.set_listing(key, version, page)
+
+        body, next_cursor = page
+        response = app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    @app.route("/products/facets", methods=["GET"])
+    @read_only
+    def get_facets():
+        etag, version, not_modified = conditional("products")
+        if not_modified:
+            return not_modified
+
+        body = catalog_cache.get_listing(("facets",), version)
+        if body is None:
+            body = app.json.dumps(facet_counts())
+            catalog_cache.set_listing(("facets",), version, body)
+        response = app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        return response
 
     @app.route("/products/<int:id>", methods=["GET"])
+    @read_only
     def get_product(id):
-        product = Product.query.get_or_404(id)
-        return jsonify(product.to_dict())
+        etag, version, not_modified = conditional("products")
+        if not_modified:
+            return not_modified
+
+        body = catalog_cache.get_product(id, version)
+        if body is None:
+            product = product_detail(id)
+            if product is None:
+                abort(404)
+            record_rows(1)
+            body = app.json.dumps(product)
+            catalog_cache.set_product(id, version, body)
+        response = app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        return response
 
     @app.route("/products", methods=["POST"])
+    @retry_on_locked
     def create_product():
         data = request.json
         product = Product(
@@ -48,168 +193,155 @@ def create_app():
         db.session.commit()
         return jsonify(product.to_dict()), 201
 
+    @app.route("/products/bulk", methods=["POST"])
+    def bulk_import_products():
+        # Not retried on lock errors: the body is consumed as it is imported
+        try:
+            format_ = request.args.get("format") or format_for(mimetype=request.mimetype)
+            reader = READERS[format_]
+        except (BulkError, KeyError):
+            return jsonify({"error": "Unknown format; use csv or jsonl"}), 400
+
+        stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+        summary = import_products(reader(stream))
+        status = 400 if summary["error_count"] and not summary["inserted"] else 200
+        return jsonify(summary), status
+
+    @app.route("/products/export", methods=["GET"])
+    @read_only
+    def export_products():
+        format_ = request.args.get("format", "csv")
+        if format_ not in EXPORTERS:
+            return jsonify({"error": "Unknown format; use csv or jsonl"}), 400
+        response = app.response_class(
+            stream_with_context(EXPORTERS[format_]()), mimetype=MIMETYPES[format_]
+        )
+        response.headers["Content-Disposition"] = f"attachment; filename=products.{format_}"
+        return response
+
+    @app.route("/cache/stats", methods=["GET"])
+    def cache_stats():
+        return jsonify(catalog_cache.stats())
+
     # -------------------- Cart --------------------
     @app.route("/cart/<string:username>", methods=["GET"])
+    @read_only
     def get_cart(username):
-        user = User.query.filter_by(username=username).first()
-        if not user:
+        user_id = resolve_user_id(username)
+        if not user_id:
             return jsonify([]), 404
-        cart_items = CartItem.query.filter_by(user_id=user.id).all()
-        return jsonify([item.to_dict() for item in cart_items])
+        return stream_json(cart_store.contents(user_id, BATCH_SIZE))
 
     @app.route("/cart", methods=["POST"])
+    @retry_on_locked
     def add_to_cart():
         data = request.json
-        user = User.query.filter_by(username=data["username"]).first()
-        product = Product.query.get(data["product_id"])
-        if not user or not product:
+        user_id = resolve_user_id(data.get("username"))
+        if not user_id or "product_id" not in data:
             return jsonify({"error": "Invalid user or product"}), 400
+        try:
+            quantity = parse_quantity(data.get("quantity", 1))
+            line, created = cart_store.add(user_id, data["product_id"], quantity)
+        except CartError as e:
+            db.session.rollback()
+            return jsonify({"error": e.message}), e.status
+        db.session.commit()
+        return jsonify(line), 201 if created else 200
 
-        if product.stock <= 0:
-            return jsonify({"error": "Product is out of stock"}), 400
-
-        existing_item = CartItem.query.filter_by(user_id=user.id, product_id=product.id).first()
-        if existing_item:
-            new_quantity = existing_item.quantity + data.get("quantity", 1)
-            if new_quantity > product.stock:
-                return jsonify({"error": f"Only {product.stock} items available"}), 400
-            existing_item.quantity = new_quantity
-            db.session.commit()
-            return jsonify(existing_item.to_dict()), 200
-
-        item = CartItem(
-            user_id=user.id,
-            product_id=product.id,
-            quantity=data.get("quantity", 1)
-        )
-        db.session.add(item)
+    @app.route("/cart/batch", methods=["POST"])
+    @retry_on_locked
+    def add_to_cart_batch():
+        data = request.json
+        user_id = resolve_user_id(data.get("username"))
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+        try:
+            quantities = parse_order_lines(data.get("items") or [])
+        except CheckoutError as e:
+            return jsonify(e.to_dict()), e.status
+        if not quantities:
+            return jsonify({"error": "Missing data"}), 400
+
+        lines, failures = cart_store.add_many(user_id, quantities)
         db.session.commit()
-        return jsonify(item.to_dict()), 201
+        status = 200 if lines else 400
+        return jsonify({"items": lines, "failures": failures}), status
 
     @app.route("/cart/<int:item_id>", methods=["DELETE"])
+    @retry_on_locked
     def remove_from_cart(item_id):
-        item = CartItem.query.get(item_id)
-        if not item:
+        if not cart_store.remove(item_id):
             return jsonify({"error": "Cart item not found"}), 404
-        db.session.delete(item)
         db.session.commit()
         return jsonify({"message": "Item removed from cart"}), 200
 
     @app.route("/cart/<int:item_id>", methods=["PATCH"])
+    @retry_on_locked
     def update_cart_item(item_id):
         data = request.json
-        cart_item = CartItem.query.get(item_id)
-        if not cart_item:
-            return jsonify({"error": "Cart item not found"}), 404
-
-        if "quantity" in data:
-            try:
-                new_quantity = int(data["quantity"])
-                if new_quantity <= 0:
-                    return jsonify({"error": "Quantity must be greater than 0"}), 400
-                if new_quantity > cart_item.product.stock:
-                    return jsonify({"error": f"Only {cart_item.product.stock} items available"}), 400
-                cart_item.quantity = new_quantity
-            except ValueError:
-                return jsonify({"error": "Invalid quantity"}), 400
-
+        if "quantity" not in data:
+            return jsonify({"error": "Missing data"}), 400
+        try:
+            line = cart_store.update(item_id, parse_quantity(data["quantity"]))
+        except CartError as e:
+            db.session.rollback()
+            return jsonify({"error": e.message}), e.status
         db.session.commit()
-        return jsonify(cart_item.to_dict()), 200
+        return jsonify(line), 200
 
     # -------------------- Checkout --------------------
     @app.route("/checkout/<string:username>", methods=["POST"])
+    @idempotent
+    @retry_on_locked
     def checkout(username):
-        user = User.query.filter_by(username=username).first()
-        if not user:
+        user_id = resolve_user_id(username)
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
 
-        cart_items = CartItem.query.filter_by(user_id=user.id).all()
-        if not cart_items:
-            return jsonify({"error": "Cart is empty"}), 400
-
-        order = Order(user_id=user.id)
-        db.session.add(order)
-        db.session.flush()  # get order.id without committing
-
-        for item in cart_items:
-            product = Product.query.get(item.product_id)
-            if not product:
-                return jsonify({"error": f"Product with id {item.product_id} not found"}), 404
-
-            # Check stock
-            if item.quantity > product.stock:
-                return jsonify({"error": f"Not enough stock for {product.name}"}), 400
-
-            # Subtract stock
-            product.stock -= item.quantity
-
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                quantity=item.quantity
-            )
-            db.session.add(order_item)
-
-            # Remove item from cart
-            db.session.delete(item)
-
-        db.session.commit()
-        return jsonify(order.to_dict()), 201
+        try:
+            order = checkout_cart(user_id)
+        except CheckoutError as e:
+            return jsonify(e.to_dict()), e.status
+        return jsonify(order), 201
 
     # -------------------- Orders --------------------
     @app.route("/orders/<username>", methods=["GET"])
+    @read_only
     def get_orders(username):
-        user = User.query.filter_by(username=username).first()
-        if not user:
+        user_id = resolve_user_id(username)
+        if not user_id:
             return jsonify([]), 404
-        orders = Order.query.filter_by(user_id=user.id).all()
-        return jsonify([o.to_dict() for o in orders])
+
+        etag, _, not_modified = conditional(f"orders:{user_id}")
+        if not_modified:
+            return not_modified
+        response = stream_json(order_history(user_id))
+        response.set_etag(etag)
+        return response
 
     @app.route("/orders", methods=["POST"])
+    @idempotent
+    @retry_on_locked
     def create_order():
         data = request.json
         username = data.get("username")
         items = data.get("items")  # list of {product_id, quantity}
 
-        if not username or not items:
+        if not (username or request.headers.get("Authorization")) or not items:
             return jsonify({"error": "Missing data"}), 400
 
-        user = User.query.filter_by(username=username).first()
-        if not user:
+        user_id = resolve_user_id(username)
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
 
-        order = Order(user_id=user.id)
-        db.session.add(order)
-        db.session.flush()  # generate order.id
-
-        for item in items:
-            product = Product.query.get(item["product_id"])
-            if not product:
-                return jsonify({"error": f"Product {item['product_id']} not found"}), 404
-
-            if product.stock < item["quantity"]:
-                return jsonify({"error": f"Not enough stock for {product.name}"}), 400
-
-            # Decrease stock
-            product.stock -= item["quantity"]
-
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                quantity=item["quantity"],
-                price=product.price
-            )
-            db.session.add(order_item)
-
-            # Remove from cart if exists
-            cart_item = CartItem.query.filter_by(user_id=user.id, product_id=product.id).first()
-            if cart_item:
-                db.session.delete(cart_item)
-
-        db.session.commit()
-        return jsonify({"message": "Order created successfully", "order_id": order.id})
+        try:
+            order = place_order(user_id, items)
+        except CheckoutError as e:
+            return jsonify(e.to_dict()), e.status
+        return jsonify({"message": "Order created successfully", "order_id": order["id"]})
 
     @app.route("/orders/<int:order_id>", methods=["DELETE"])
+    @retry_on_locked
     def delete_order(order_id):
         order = Order.query.get(order_id)
         if not order:
@@ -223,7 +355,7 @@ def create_app():
 
 
 if __name__ == "__main__":
-    app = create_app()
+    app = create_app({"DEBUG": True})
     with app.app_context():
         db.create_all()
     app.run(debug=True)
@@ -1,10 +1,108 @@
-from flask import Blueprint, request, jsonify
+import threading
+
+from flask import Blueprint, current_app, g, request, jsonify
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from server.cache import LRUCache
 from server.models import db, User
+from server.database import retry_on_locked
 
 auth_bp = Blueprint("auth", __name__)
 
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@auth_bp.app_errorhandler(AuthError)
+def auth_error(e):
+    return jsonify({"error": e.message}), e.status
+
+
+# -------------------- TOKENS --------------------
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt="access-token")
+
+
+def issue_token(user):
+    """Signed, stateless access token carrying the user's id and username."""
+    return _serializer().dumps({"uid": user.id, "u": user.username})
+
+
+def read_token(token):
+    try:
+        return _serializer().loads(token, max_age=current_app.config.get("TOKEN_MAX_AGE", 86400))
+    except BadSignature:  # also covers SignatureExpired
+        raise AuthError("Invalid or expired token")
+
+
+def bearer_token():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip()
+    return None
+
+
+# -------------------- USER RESOLUTION --------------------
+
+
+class UserCache:
+    """Small LRU of user ids by username.
+
+    Usernames never change once created, so entries only age out through
+    LRU/TTL eviction. Misses are not cached, so new signups are seen
+    immediately.
+    """
+
+    def __init__(self, maxsize=2048, ttl=600):
+        self._lock = threading.Lock()
+        self._ids = LRUCache(maxsize, ttl)
+
+    def id_for(self, username):
+        with self._lock:
+            user_id = self._ids.get(username)
+        if user_id is None:
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                return None
+            user_id = user.id
+            with self._lock:
+                self._ids.set(username, user_id)
+        return user_id
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+user_cache = UserCache()
+
+
+def resolve_user_id(username):
+    """The id of the user a request acts for, usually without touching the DB.
+
+    With an ``Authorization: Bearer`` token the id comes straight from the
+    verified token, and the token must belong to ``username``. Without one we
+    fall back to a cached username lookup. Returns None for unknown users.
+    """
+    token = bearer_token()
+    if token:
+        payload = read_token(token)
+        if username is not None and payload.get("u") != username:
+            raise AuthError("Token does not match user", 403)
+        user_id = payload["uid"]
+    elif username:
+        user_id = user_cache.id_for(username)
+    else:
+        user_id = None
+    g.acting_user_id = user_id
+    return user_id
+
 # -------------------- SIGNUP --------------------
 @auth_bp.route("/signup", methods=["POST"])
+@retry_on_locked
 def signup():
     data = request.json
     if not data.get("username") or not data.get("email") or not data.get("password"):
@@ -18,7 +116,7 @@ def signup():
     user = User(username=data["username"], email=data["email"], password=data["password"])
     db.session.add(user)
     db.session.commit()
-    return jsonify(user.to_dict()), 201
+    return jsonify({**user.to_dict(), "token": issue_token(user)}), 201
 
 # -------------------- LOGIN --------------------
 @auth_bp.route("/login", methods=["POST"])
@@ -26,11 +124,16 @@ def login():
     data = request.json
     user = User.query.filter_by(username=data.get("username")).first()
     if user and user.check_password(data.get("password")):
-        return jsonify(user.to_dict())
+        # Upgrade hashes made with an old work factor while we have the plaintext
+        if user.password_needs_rehash:
+            user.password = data["password"]
+            db.session.commit()
+        return jsonify({**user.to_dict(), "token": issue_token(user)})
     return jsonify({"error": "Invalid credentials"}), 401
 
 # -------------------- LOGOUT --------------------
 @auth_bp.route("/logout", methods=["POST"])
 def logout():
-    # For simple API: client deletes token/session
+    # Tokens are stateless: the client discards its token, which also
+    # expires on its own after TOKEN_MAX_AGE seconds
     return jsonify({"message": "Logged out successfully"})
@@ -0,0 +1,309 @@
+# server/bulk.py
+"""Bulk catalog import and export, as CSV or JSON Lines.
+
+Imports are streamed: rows are read, validated with the same rules as the
+``Product`` validators and inserted with one Core executemany per batch, then
+committed, so memory stays flat and a bad row costs only its own error entry.
+Exports stream ``products`` out in id order, in the same columns an import
+accepts, so a catalog round-trips.
+
+    flask --app server.app:create_app products import catalog.csv
+    flask --app server.app:create_app products export --format jsonl -o catalog.jsonl
+"""
+import contextlib
+import csv
+import io
+import json
+import math
+import sys
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from . import facets, search
+from .changes import mark_changed
+from .metrics import record_rows
+from .models import db, Product, check_price, check_stock
+from .serializers import dumps
+from .streaming import CHUNK_SIZE
+
+FORMATS = ("csv", "jsonl")
+IMPORT_BATCH_SIZE = 20000
+EXPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_COLUMNS = ("name", "price", "description", "image_url", "category", "brand", "stock")
+EXPORT_COLUMNS = ("id",) + IMPORT_COLUMNS + ("created_at",)
+_TEXT_COLUMNS = ("description", "image_url", "category", "brand")
+
+_products = Product.__table__
+_name_length = _products.c.name.type.length
+
+# Per-row triggers replaced by one statement per batch during imports
+_DEFERRED_TRIGGERS = [
+    (search.INSERT_TRIGGER, search.index_range),
+    (facets.INSERT_TRIGGER, facets.count_range),
+]
+
+
+class BulkError(ValueError):
+    """A bulk request that cannot be processed at all (not a bad row)."""
+
+
+def format_for(filename=None, mimetype=None):
+    """Guess the format from a file name or a request's content type."""
+    if filename and filename.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if filename and filename.endswith(".csv"):
+        return "csv"
+    if mimetype in ("application/x-ndjson", "application/jsonl", "application/json-lines"):
+        return "jsonl"
+    if mimetype in ("text/csv", "application/csv"):
+        return "csv"
+    raise BulkError("Unknown format; use csv or jsonl")
+
+
+# -------------------- Reading --------------------
+def read_csv(stream):
+    """Yield ``(line, record)`` for each CSV row; the header names the columns."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(stream):
+    """Yield ``(line, record)`` for each JSON object; bad lines yield the error."""
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError:
+            yield line, ValueError("Invalid JSON")
+            continue
+        if not isinstance(record, dict):
+            record = ValueError("Each line must be a JSON object")
+        yield line, record
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def _number(value, cast, label):
+    if isinstance(value, bool) or value in (None, ""):
+        raise ValueError(f"{label} is required")
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {label.lower()}") from None
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ValueError(f"Invalid {label.lower()}")
+    return number
+
+
+def _integer(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def product_row(record):
+    """Validate one import record into column values for ``insert(Product)``.
+
+    Raises ValueError with the reason the row was rejected.
+    """
+    name = record.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("Name is required")
+    if len(name) > _name_length:
+        raise ValueError(f"Name is longer than {_name_length} characters")
+
+    row = {
+        "name": name,
+        "price": check_price(_number(record.get("price"), float, "Price")),
+        "stock": 0,
+    }
+    if record.get("stock") not in (None, ""):
+        row["stock"] = check_stock(_number(record["stock"], _integer, "Stock"))
+    for column in _TEXT_COLUMNS:
+        value = record.get(column)
+        row[column] = "" if value is None else str(value)
+    return row
+
+
+# -------------------- Import --------------------
+def _suspend_triggers(connection):
+    """Drop the deferrable insert triggers this database has; returns them.
+
+    Opens the write transaction first: pysqlite only begins one before DML,
+    so the DROPs would otherwise run, and commit, on their own.
+    """
+    if connection.dialect.name != "sqlite":
+        return []
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    existing = set(connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    ).scalars())
+    suspended = [entry for entry in _DEFERRED_TRIGGERS if entry[0][0] in existing]
+    for (name, _), _ in suspended:
+        connection.exec_driver_sql(f"DROP TRIGGER {name}")
+    return suspended
+
+
+def _restore_triggers(suspended):
+    """Recreate ``suspended`` triggers a rolled back batch left missing."""
+    connection = db.session.connection()
+    for (_, ddl), _ in suspended:
+        connection.exec_driver_sql(ddl)  # IF NOT EXISTS: a no-op after a clean rollback
+    db.session.commit()
+
+
+def _insert(batch):
+    """Insert and commit one batch.
+
+    On SQLite the search index and facet insert triggers are dropped for the
+    batch, and their work is done with one statement each over the batch's
+    id range. Per-row trigger work is several times slower. The DDL is part
+    of the batch's transaction, so other connections never see the triggers
+    missing, and a failed batch puts them back.
+    """
+    connection = db.session.connection()
+    suspended = _suspend_triggers(connection)
+    try:
+        # Read after the DROPs, which hold the write lock, so the range is ours
+        last_id = connection.execute(db.select(func.max(Product.id))).scalar() or 0
+        connection.execute(_products.insert(), batch)
+        if suspended:
+            new_last_id = connection.execute(db.select(func.max(Product.id))).scalar()
+            for (_, ddl), catch_up in suspended:
+                catch_up(connection, last_id + 1, new_last_id)
+                connection.exec_driver_sql(ddl)
+        # Bumps the products ETag and drops cached listings on commit
+        mark_changed(db.session, "products", ())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if suspended:
+            _restore_triggers(suspended)
+        raise
+
+
+def import_products(records, batch_size=IMPORT_BATCH_SIZE):
+    """Insert every valid record from ``(line, record)`` pairs, in batches.
+
+    Each batch is committed on its own, so rows before a failure stay
+    imported. Returns a summary with the inserted count and per-row errors
+    (the first MAX_REPORTED_ERRORS of them).
+    """
+    inserted = 0
+    error_count = 0
+    errors = []
+    batch = []
+    for line, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            batch.append(product_row(record))
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            _insert(batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        _insert(batch)
+        inserted += len(batch)
+    return {"inserted": inserted, "error_count": error_count, "errors": errors}
+
+
+# -------------------- Export --------------------
+def _export_rows(batch_size):
+    columns = [getattr(Product, column) for column in EXPORT_COLUMNS]
+    query = db.select(*columns).order_by(Product.id).execution_options(yield_per=batch_size)
+    return db.session.execute(query)
+
+
+def iter_csv(batch_size=EXPORT_BATCH_SIZE):
+    """Yield the catalog as CSV text in chunks of about CHUNK_SIZE."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in _export_rows(batch_size):
+        count += 1
+        writer.writerow([
+            value.isoformat() if column == "created_at" and value else value
+            for column, value in zip(EXPORT_COLUMNS, row)
+        ])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    record_rows(count)
+    yield buffer.getvalue()
+
+
+def iter_jsonl(batch_size=EXPORT_BATCH_SIZE):
+    """Yield the catalog as JSON Lines text in chunks of about CHUNK_SIZE."""
+    buffer = []
+    size = 0
+    count = 0
+    for row in _export_rows(batch_size):
+        count += 1
+        line = dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    record_rows(count)
+    yield "".join(buffer)
+
+
+EXPORTERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+# -------------------- CLI --------------------
+products_cli = AppGroup("products", help="Bulk catalog import and export.")
+
+
+def _open(path, mode):
+    # newline="" as the csv module expects; "-" is stdin/stdout
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+@products_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "format_", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True)
+def import_command(path, format_, batch_size):
+    """Import products from a CSV or JSONL file ("-" for stdin)."""
+    try:
+        format_ = format_ or format_for(path)
+    except BulkError as e:
+        raise click.UsageError(str(e))
+    with _open(path, "r") as stream:
+        summary = import_products(READERS[format_](stream), batch_size)
+    for error in summary["errors"]:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Imported {summary['inserted']} products, {summary['error_count']} rows rejected")
+    if summary["error_count"]:
+        sys.exit(1)
+
+
+@products_cli.command("export")
+@click.option("--format", "format_", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("-o", "--output", default="-", help="File to write; stdout by default.")
+def export_command(format_, output):
+    """Export every product as CSV or JSONL."""
+    with _open(output, "w") as stream:
+        for chunk in EXPORTERS[format_]():
+            stream.write(chunk)
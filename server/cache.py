@@ -0,0 +1,140 @@
+# server/cache.py
+"""In-process cache of serialized product JSON.
+
+Holds one entry per product for GET /products/<id> and one per distinct
+listing query for GET /products, each with LRU eviction and a TTL. Entries
+are dropped as soon as a transaction that wrote to ``products`` commits.
+
+That only covers writes made by this process, so every entry also carries
+the ``products`` version it was built under. A lookup with any other
+version is a miss, so a body is never served under an ETag it does not
+match after another worker's write.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .changes import on_commit
+
+
+class LRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """Store ``value``; returns how many entries were evicted to fit it."""
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CatalogCache:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.products = LRUCache(maxsize=1024, ttl=60)
+        self.listings = LRUCache(maxsize=256, ttl=60)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault("CATALOG_CACHE_ENABLED", True)
+        ttl = app.config.setdefault("CATALOG_CACHE_TTL", 60)
+        self.products = LRUCache(app.config.setdefault("CATALOG_CACHE_SIZE", 1024), ttl)
+        self.listings = LRUCache(app.config.setdefault("CATALOG_CACHE_LISTINGS", 256), ttl)
+        app.extensions["catalog_cache"] = self
+
+    def _get(self, store, key, version):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = store.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def _set(self, store, key, version, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = store.get(key)
+            if entry is not None and entry[0] > version:
+                return  # a newer body got there first
+            self.evictions += store.set(key, (version, value))
+
+    def get_product(self, id, version):
+        return self._get(self.products, id, version)
+
+    def set_product(self, id, version, body):
+        self._set(self.products, id, version, body)
+
+    def get_listing(self, key, version):
+        return self._get(self.listings, key, version)
+
+    def set_listing(self, key, version, page):
+        self._set(self.listings, key, version, page)
+
+    def invalidate_products(self, ids):
+        with self._lock:
+            for id in ids:
+                self.products.pop(id)
+            # Any listing page may contain a changed product
+            self.listings.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "products": len(self.products),
+                "listings": len(self.listings),
+            }
+
+
+catalog_cache = CatalogCache()
+
+
+@on_commit
+def _invalidate(changes):
+    if "products" in changes:
+        catalog_cache.invalidate_products(changes["products"])
+
+
+def listing_key(args):
+    """Canonical cache key for a set of listing query parameters."""
+    return tuple(sorted(args.items(multi=True)))
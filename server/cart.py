@@ -0,0 +1,133 @@
+# server/cart.py
+"""Single-statement add-to-cart.
+
+Adding to the cart is one ``INSERT ... ON CONFLICT (user_id, product_id) DO
+UPDATE`` whose SELECT and conflict WHERE both check the product's stock, so
+the existence check, stock check and insert-or-increment happen atomically
+and concurrent adds cannot create duplicate rows or exceed stock. RETURNING
+hands back the cart line with its product details in the same round trip.
+"""
+import json
+
+from sqlalchemy import text
+
+from .changes import mark_changed
+from .models import db, Product
+
+_RETURNING = """
+RETURNING id, user_id, product_id, quantity,
+    (SELECT name FROM products WHERE products.id = cart_items.product_id) AS product_name,
+    (SELECT price FROM products WHERE products.id = cart_items.product_id) AS price,
+    (SELECT image_url FROM products WHERE products.id = cart_items.product_id) AS image_url
+"""
+
+_ON_CONFLICT = """
+ON CONFLICT (user_id, product_id) DO UPDATE
+SET quantity = cart_items.quantity + excluded.quantity
+WHERE (SELECT stock FROM products WHERE products.id = excluded.product_id)
+    >= cart_items.quantity + excluded.quantity
+"""
+
+UPSERT = text(
+    "INSERT INTO cart_items (user_id, product_id, quantity) "
+    "SELECT :user_id, products.id, :quantity FROM products "
+    "WHERE products.id = :product_id AND products.stock >= :quantity"
+    + _ON_CONFLICT + _RETURNING
+)
+
+# Same statement over many lines at once; lines arrive as one JSON array
+BATCH_UPSERT = text(
+    "INSERT INTO cart_items (user_id, product_id, quantity) "
+    "SELECT :user_id, products.id, json_extract(line.value, '$.quantity') "
+    "FROM json_each(:lines) AS line "
+    "JOIN products ON products.id = json_extract(line.value, '$.product_id') "
+    "WHERE products.stock >= json_extract(line.value, '$.quantity')"
+    + _ON_CONFLICT + _RETURNING
+)
+
+
+class CartError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _line(row):
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "product_id": row.product_id,
+        "product_name": row.product_name,
+        "price": row.price,
+        "image_url": row.image_url,
+        "quantity": row.quantity,
+    }
+
+
+def parse_quantity(value):
+    """A requested quantity from JSON as a positive int; raises CartError.
+
+    ``int(True)`` is 1, so booleans are rejected before the cast.
+    """
+    if isinstance(value, bool):
+        raise CartError("Invalid quantity")
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise CartError("Invalid quantity") from None
+    if quantity <= 0:
+        raise CartError("Quantity must be greater than 0")
+    return quantity
+
+
+def unavailable(stock):
+    """Why a line was rejected, given the product's current stock (or None)."""
+    if stock is None:
+        return "Invalid user or product"
+    if stock <= 0:
+        return "Product is out of stock"
+    return f"Only {stock} items available"
+
+
+def add_item(user_id, product_id, quantity):
+    """Add ``quantity`` of a product to the cart; returns ``(line, created)``.
+
+    Raises CartError if the product does not exist or the cart would then
+    hold more than is in stock. The caller commits.
+    """
+    row = db.session.execute(
+        UPSERT, {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+    ).first()
+    if row is None:
+        stock = db.session.query(Product.stock).filter_by(id=product_id).scalar()
+        raise CartError(unavailable(stock))
+    mark_changed(db.session, "cart_items", [row.id])
+    # Quantities are always >= 1, so an untouched amount means a fresh row
+    return _line(row), row.quantity == quantity
+
+
+def add_items(user_id, quantities):
+    """Upsert ``{product_id: quantity}`` into the cart in one statement.
+
+    Returns ``(lines, failures)``: the cart lines written and, for every line
+    that was rejected, its product id and the reason. The caller commits.
+    """
+    lines = [{"product_id": pid, "quantity": qty} for pid, qty in quantities.items()]
+    rows = db.session.execute(
+        BATCH_UPSERT, {"user_id": user_id, "lines": json.dumps(lines)}
+    ).all()
+    written = [_line(row) for row in rows]
+    mark_changed(db.session, "cart_items", [row.id for row in rows])
+
+    missing = set(quantities) - {row.product_id for row in rows}
+    failures = []
+    if missing:
+        stocks = dict(
+            db.session.query(Product.id, Product.stock).filter(Product.id.in_(missing)).all()
+        )
+        failures = [
+            {"product_id": pid, "error": unavailable(stocks.get(pid))}
+            for pid in sorted(missing)
+        ]
+    return written, failures
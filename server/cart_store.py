@@ -0,0 +1,367 @@
+# server/cart_store.py
+"""Pluggable storage for shopping carts.
+
+Cart traffic is write-heavy and short-lived, so where carts live is a
+configuration choice (``CART_STORE``):
+
+``sql``
+    The ``cart_items`` table (default).
+``memory``
+    Carts kept in a process-local dict. For tests and single-process
+    deployments; carts are lost on restart.
+``redis``
+    Carts kept in Redis at ``CART_REDIS_URL`` (needs the ``redis`` package).
+
+The key-value stores keep one hash per user (``cart:<user_id>``, product id
+to quantity), so adding to or editing a cart never writes to the database.
+A cart only reaches SQL when it is checked out and becomes order items.
+
+Every store has the same interface. Writes to the SQL store join the
+current transaction and the caller commits. Key-value writes apply
+immediately, except ``clear``, which waits for the current transaction to
+commit so a failed checkout never loses the cart.
+"""
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+
+from .cart import CartError, add_item, add_items, unavailable
+from .models import db, Product, CartItem, cart_contents
+
+_LINE_PRODUCT_FIELDS = (Product.id, Product.name, Product.price, Product.image_url, Product.stock)
+
+
+class SQLCartStore:
+    """Carts as rows in ``cart_items``."""
+
+    def contents(self, user_id, batch_size=1000):
+        return cart_contents(user_id, batch_size)
+
+    def quantities(self, user_id):
+        """The cart as ``{product_id: quantity}``."""
+        return dict(
+            db.session.query(CartItem.product_id, CartItem.quantity).filter_by(user_id=user_id)
+        )
+
+    def add(self, user_id, product_id, quantity):
+        return add_item(user_id, product_id, quantity)
+
+    def add_many(self, user_id, quantities):
+        return add_items(user_id, quantities)
+
+    def owner(self, item_id):
+        """``(user_id, product_id)`` of a cart line, or None."""
+        row = db.session.query(CartItem.user_id, CartItem.product_id).filter_by(id=item_id).first()
+        return tuple(row) if row else None
+
+    def update(self, item_id, quantity):
+        cart_item = db.session.get(CartItem, item_id)
+        if not cart_item:
+            raise CartError("Cart item not found", 404)
+        if quantity > cart_item.product.stock:
+            raise CartError(f"Only {cart_item.product.stock} items available")
+        cart_item.quantity = quantity
+        return cart_item.to_dict()
+
+    def remove(self, item_id):
+        item = db.session.get(CartItem, item_id)
+        if not item:
+            return False
+        db.session.delete(item)
+        return True
+
+    def clear(self, user_id, product_ids=None):
+        query = CartItem.query.filter(CartItem.user_id == user_id)
+        if product_ids is not None:
+            query = query.filter(CartItem.product_id.in_(product_ids))
+        query.delete(synchronize_session=False)
+
+
+class LocalKV:
+    """The handful of Redis hash/counter commands the cart store uses, in a dict.
+
+    Values are stored as strings, as Redis returns them with
+    ``decode_responses=True``. Every command is atomic under one lock, and
+    so is every ``pipeline()``, like a Redis MULTI/EXEC.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def pipeline(self):
+        return _LocalPipeline(self)
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._data.get(key, {}).get(str(field))
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def hset(self, key, field, value):
+        with self._lock:
+            hash_ = self._data.setdefault(key, {})
+            created = str(field) not in hash_
+            hash_[str(field)] = str(value)
+            return int(created)
+
+    def hsetnx(self, key, field, value):
+        with self._lock:
+            hash_ = self._data.setdefault(key, {})
+            if str(field) in hash_:
+                return 0
+            hash_[str(field)] = str(value)
+            return 1
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            hash_ = self._data.setdefault(key, {})
+            value = int(hash_.get(str(field), 0)) + amount
+            hash_[str(field)] = str(value)
+            return value
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            hash_ = self._data.get(key, {})
+            removed = sum(hash_.pop(str(field), None) is not None for field in fields)
+            if not hash_:
+                self._data.pop(key, None)
+            return removed
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, 0)) + 1
+            self._data[key] = str(value)
+            return value
+
+
+class _LocalPipeline:
+    """Queues LocalKV commands and runs them together under its lock."""
+
+    def __init__(self, kv):
+        self._kv = kv
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._kv, name)
+
+        def queue(*args):
+            self._commands.append((command, args))
+            return self
+        return queue
+
+    def execute(self):
+        with self._kv._lock:
+            results = [command(*args) for command, args in self._commands]
+        self._commands = []
+        return results
+
+
+class KVCartStore:
+    """Carts as one hash per user in a Redis-compatible key-value store.
+
+    ``cart:<user_id>`` maps product id to quantity. Cart lines keep stable
+    integer ids for the ``/cart/<item_id>`` routes: ``cart:<user_id>:ids``
+    maps product id to line id and ``cart:items`` maps line id back to
+    ``<user_id>:<product_id>``.
+    """
+
+    def __init__(self, kv):
+        self.kv = kv
+
+    @staticmethod
+    def _cart_key(user_id):
+        return f"cart:{user_id}"
+
+    @staticmethod
+    def _ids_key(user_id):
+        return f"cart:{user_id}:ids"
+
+    def owner(self, item_id):
+        """``(user_id, product_id)`` of a cart line, or None."""
+        owner = self.kv.hget("cart:items", item_id)
+        if owner is None:
+            return None
+        user_id, product_id = owner.split(":")
+        return int(user_id), int(product_id)
+
+    def _products(self, product_ids):
+        return {
+            row.id: row
+            for row in db.session.execute(
+                db.select(*_LINE_PRODUCT_FIELDS).where(Product.id.in_(product_ids))
+            )
+        }
+
+    @staticmethod
+    def _line(item_id, user_id, product, quantity):
+        return {
+            "id": item_id,
+            "user_id": user_id,
+            "product_id": product.id,
+            "product_name": product.name,
+            "price": product.price,
+            "image_url": product.image_url,
+            "quantity": quantity,
+        }
+
+    def contents(self, user_id, batch_size=1000):
+        quantities = self.quantities(user_id)
+        if not quantities:
+            return []
+        ids = self.kv.hgetall(self._ids_key(user_id))
+        products = self._products(quantities)
+        lines = [
+            self._line(int(ids[str(pid)]), user_id, products[pid], quantity)
+            for pid, quantity in quantities.items()
+            if pid in products and str(pid) in ids
+        ]
+        return sorted(lines, key=lambda line: line["id"])
+
+    def quantities(self, user_id):
+        return {
+            int(pid): int(quantity)
+            for pid, quantity in self.kv.hgetall(self._cart_key(user_id)).items()
+            if int(quantity) > 0
+        }
+
+    def _line_id(self, user_id, product_id):
+        """The cart line id for a product, assigning one if it has none.
+
+        The id is in place before any quantity is, so a concurrent add that
+        sees the quantity also finds the id.
+        """
+        ids_key = self._ids_key(user_id)
+        while True:
+            item_id = self.kv.hget(ids_key, product_id)
+            if item_id is not None:
+                return int(item_id)
+            # Owner first, so every id in the ids hash resolves in owner()
+            candidate = self.kv.incr("cart:next_id")
+            self.kv.hset("cart:items", candidate, f"{user_id}:{product_id}")
+            if self.kv.hsetnx(ids_key, product_id, candidate):
+                return candidate
+            # Another add won; use its id, or retry if a remove took it since
+            self.kv.hdel("cart:items", candidate)
+
+    def _add(self, user_id, product, quantity):
+        key = self._cart_key(user_id)
+        item_id = self._line_id(user_id, product.id)
+        total = self.kv.hincrby(key, product.id, quantity)
+        if total > product.stock:
+            # Undo our increment; concurrent adds each see their own total
+            if self.kv.hincrby(key, product.id, -quantity) <= 0:
+                self.kv.hdel(key, product.id)
+            raise CartError(unavailable(product.stock))
+        return self._line(item_id, user_id, product, total), total == quantity
+
+    def add(self, user_id, product_id, quantity):
+        product = self._products([product_id]).get(product_id)
+        if product is None:
+            raise CartError(unavailable(None))
+        return self._add(user_id, product, quantity)
+
+    def add_many(self, user_id, quantities):
+        products = self._products(quantities)
+        lines = []
+        failures = []
+        for product_id in sorted(quantities):
+            product = products.get(product_id)
+            try:
+                if product is None:
+                    raise CartError(unavailable(None))
+                lines.append(self._add(user_id, product, quantities[product_id])[0])
+            except CartError as e:
+                failures.append({"product_id": product_id, "error": e.message})
+        return lines, failures
+
+    def update(self, item_id, quantity):
+        owner = self.owner(item_id)
+        if owner is None:
+            raise CartError("Cart item not found", 404)
+        user_id, product_id = owner
+        product = self._products([product_id]).get(product_id)
+        if product is None:
+            raise CartError("Cart item not found", 404)
+        if quantity > product.stock:
+            raise CartError(f"Only {product.stock} items available")
+        self.kv.hset(self._cart_key(user_id), product_id, quantity)
+        return self._line(item_id, user_id, product, quantity)
+
+    def remove(self, item_id):
+        owner = self.owner(item_id)
+        if owner is None:
+            return False
+        user_id, product_id = owner
+        pipe = self.kv.pipeline()
+        pipe.hdel(self._cart_key(user_id), product_id)
+        pipe.hdel(self._ids_key(user_id), product_id)
+        pipe.hdel("cart:items", item_id)
+        pipe.execute()
+        return True
+
+    def clear(self, user_id, product_ids=None):
+        db.session.info.setdefault("cart_clears", []).append((self, user_id, product_ids))
+
+    def _clear_now(self, user_id, product_ids):
+        ids = self.kv.hgetall(self._ids_key(user_id))
+        if product_ids is None:
+            product_ids = [int(pid) for pid in ids]
+        fields = [str(pid) for pid in product_ids]
+        item_ids = [ids[field] for field in fields if field in ids]
+        pipe = self.kv.pipeline()
+        if item_ids:
+            pipe.hdel("cart:items", *item_ids)
+        if fields:
+            pipe.hdel(self._cart_key(user_id), *fields)
+            pipe.hdel(self._ids_key(user_id), *fields)
+        pipe.execute()
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_clears(session):
+    for store, user_id, product_ids in session.info.pop("cart_clears", ()):
+        store._clear_now(user_id, product_ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_clears(session):
+    session.info.pop("cart_clears", None)
+
+
+def _redis_client(url):
+    try:
+        import redis
+    except ImportError:  # optional dependency
+        raise RuntimeError("CART_STORE=redis needs the redis package installed") from None
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+class CartStore:
+    """Picks the store for each app and forwards calls to the current app's one."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.setdefault("CART_STORE", "sql")
+        if backend == "sql":
+            store = SQLCartStore()
+        elif backend == "memory":
+            store = KVCartStore(LocalKV())
+        elif backend == "redis":
+            url = app.config.setdefault("CART_REDIS_URL", "redis://localhost:6379/0")
+            store = KVCartStore(_redis_client(url))
+        else:
+            raise ValueError(f"Unknown CART_STORE {backend!r}")
+        app.extensions["cart_store"] = store
+
+    def __getattr__(self, name):
+        return getattr(current_app.extensions["cart_store"], name)
+
+
+cart_store = CartStore()
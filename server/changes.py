@@ -0,0 +1,52 @@
+# server/changes.py
+"""Track which rows a transaction touched and announce them on commit.
+
+ORM writes are picked up automatically at flush time. Bulk statements that
+bypass the ORM (e.g. the conditional stock UPDATE in checkout) must call
+``mark_changed`` themselves.
+"""
+from sqlalchemy import event
+
+from .models import db
+
+_listeners = []
+
+
+def mark_changed(session, table, ids):
+    pending = session.info.setdefault("changed_rows", {})
+    pending.setdefault(table, set()).update(ids)
+
+
+def pending_changes(session):
+    """Rows marked as written in the current transaction so far."""
+    return session.info.get("changed_rows", {})
+
+
+def on_commit(callback):
+    """Register ``callback(changes)``, called after each commit that wrote rows.
+
+    ``changes`` maps table name to the set of primary keys written.
+    """
+    _listeners.append(callback)
+    return callback
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table is not None and getattr(obj, "id", None) is not None:
+            mark_changed(session, table, [obj.id])
+
+
+@event.listens_for(db.session, "after_commit")
+def _announce(session):
+    changes = session.info.pop("changed_rows", None)
+    if changes:
+        for callback in _listeners:
+            callback(changes)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard(session):
+    session.info.pop("changed_rows", None)
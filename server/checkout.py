@@ -0,0 +1,229 @@
+# server/checkout.py
+from sqlalchemy import bindparam, insert
+
+from .models import db, Product, Order, OrderItem
+from .changes import mark_changed
+from .cart_store import cart_store
+from .reservations import reservations
+from . import stock_shards
+
+
+class CheckoutError(Exception):
+    """A checkout that cannot go through; carries the HTTP status to return."""
+
+    def __init__(self, message, status=400, failures=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.failures = failures or []
+
+    def to_dict(self):
+        body = {"error": self.message}
+        if self.failures:
+            body["failures"] = self.failures
+        return body
+
+
+_products = Product.__table__
+_decrement = (
+    _products.update()
+    .where(_products.c.id == bindparam("product_id"), _products.c.stock >= bindparam("quantity"))
+    .values(stock=_products.c.stock - bindparam("quantity"))
+)
+
+
+def stock_failures(quantities, products, available=None):
+    """Every line of ``{product_id: quantity}`` that cannot be filled.
+
+    ``available`` overrides product stock for some lines, e.g. with what
+    other shoppers' reservations leave free.
+    """
+    available = available or {}
+    failures = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            failures.append({"product_id": product_id, "error": f"Product {product_id} not found"})
+            continue
+        stock = available.get(product_id, product.stock)
+        if quantity > stock:
+            failures.append({
+                "product_id": product_id,
+                "error": f"Not enough stock for {product.name}",
+                "requested": quantity,
+                "available": stock,
+            })
+    return failures
+
+
+def _failure_error(failures):
+    if all("available" not in f for f in failures):
+        return CheckoutError(failures[0]["error"], 404, failures)
+    return CheckoutError(failures[0]["error"], 400, failures)
+
+
+def decrement_stock(quantities):
+    """Atomically take ``{product_id: quantity}`` units off product stock.
+
+    All lines go out as one executemany of a conditional UPDATE, so the stock
+    check and the decrement are a single statement per row and two concurrent
+    checkouts can never both pass the check against the same units. Returns
+    False if any line did not have enough stock; the caller must roll back.
+    """
+    # Sharded hot products take from a random counter row instead
+    sharded = stock_shards.shard_counts(list(quantities))
+    for product_id in sorted(sharded):
+        if not stock_shards.take(product_id, quantities[product_id], sharded[product_id]):
+            return False
+    mark_changed(db.session, "products", quantities)
+
+    # Stable id order so concurrent writers take row locks the same way
+    params = [
+        {"product_id": product_id, "quantity": quantities[product_id]}
+        for product_id in sorted(quantities)
+        if product_id not in sharded
+    ]
+    if not params:
+        return True
+    result = db.session.execute(_decrement, params)
+    return result.rowcount == len(params)
+
+
+def _write_order(user_id, quantities, products):
+    """Decrement stock and write the order and its items; caller commits.
+
+    Unit prices and the order total are snapshotted from ``products`` so
+    order history never has to re-read live prices. Returns the order as
+    ``Order.to_dict`` would, built from ``products`` and the inserted ids so
+    the response needs no lazy loads after the commit.
+    """
+    order = Order(
+        user_id=user_id,
+        total=sum(products[pid].price * qty for pid, qty in quantities.items()),
+    )
+    db.session.add(order)
+    db.session.flush()  # get order.id without committing
+
+    if not decrement_stock(quantities):
+        # Someone else took the stock between our read and the update
+        db.session.rollback()
+        # Sharded products that ran dry would otherwise list stale stock
+        stock_shards.sync(list(quantities))
+        fresh = {p.id: p for p in Product.query.filter(Product.id.in_(quantities))}
+        raise _failure_error(
+            stock_failures(quantities, fresh, stock_shards.shard_totals(list(quantities)))
+        )
+
+    # One multi-row INSERT; lines are matched back to their ids by product
+    item_ids = dict(db.session.execute(
+        insert(OrderItem).returning(OrderItem.product_id, OrderItem.id),
+        [
+            {
+                "order_id": order.id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price": products[product_id].price,
+            }
+            for product_id, quantity in quantities.items()
+        ],
+    ).all())
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "items": [
+            {
+                "id": item_ids[product_id],
+                "product": products[product_id].name,
+                "price": products[product_id].price,
+                "image_url": products[product_id].image_url,
+                "quantity": quantity,
+            }
+            for product_id, quantity in sorted(quantities.items(), key=lambda line: item_ids[line[0]])
+        ],
+        "total": order.total,
+        "created_at": order.created_at.isoformat(),
+    }
+
+
+def _order_lines(user_id, quantities):
+    """Validate, write and commit an order for ``{product_id: quantity}``.
+
+    Every line is checked against stock, then against other shoppers'
+    holds, before anything is written. The ordered products leave the
+    user's cart in the same transaction. Returns the order as a dict.
+    """
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(quantities))}
+    failures = stock_failures(quantities, products)
+    if not failures:
+        failures = stock_failures(quantities, products, reservations.convert(user_id, quantities))
+    if failures:
+        raise _failure_error(failures)
+
+    try:
+        order = _write_order(user_id, quantities, products)
+        cart_store.clear(user_id, quantities)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return order
+
+
+def checkout_cart(user_id):
+    """Turn a user's cart into an order in a single transaction.
+
+    Products are read with one IN query, stock is decremented with one
+    batched conditional UPDATE, order items are bulk inserted and the cart
+    cleared. Nothing is committed unless every line succeeds, and a cart
+    kept outside SQL is only cleared once the order has committed. With
+    reservations enabled, other shoppers' holds count against stock and the
+    user's own holds are converted. Returns the order as a dict.
+    """
+    quantities = cart_store.quantities(user_id)
+    if not quantities:
+        raise CheckoutError("Cart is empty")
+
+    return _order_lines(user_id, quantities)
+
+
+def parse_order_lines(items):
+    """Validate a POST /orders ``items`` payload into ``{product_id: quantity}``.
+
+    Every malformed line is reported at once rather than stopping at the first.
+    """
+    if not isinstance(items, list):
+        raise CheckoutError("items must be a list")
+
+    quantities = {}
+    failures = []
+    for index, item in enumerate(items):
+        try:
+            product_id, quantity = item["product_id"], item.get("quantity", 1)
+            if isinstance(product_id, bool) or isinstance(quantity, bool):
+                raise TypeError  # int(True) would read as 1
+            product_id, quantity = int(product_id), int(quantity)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            failures.append({"line": index, "error": "Invalid product_id or quantity"})
+            continue
+        if quantity <= 0:
+            failures.append({"line": index, "error": "Quantity must be greater than 0"})
+            continue
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if failures:
+        raise CheckoutError(failures[0]["error"], 400, failures)
+    return quantities
+
+
+def place_order(user_id, items):
+    """Place an order for an explicit list of lines, B2B style.
+
+    Products are loaded with one IN query and every line is validated up
+    front, so the response lists all failing lines together. Stock goes out
+    in one batched conditional UPDATE, order items in one bulk insert, and
+    the ordered products are removed from the user's cart. Returns the order
+    as a dict.
+    """
+    quantities = parse_order_lines(items)
+
+    return _order_lines(user_id, quantities)
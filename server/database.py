@@ -0,0 +1,112 @@
+# server/database.py
+"""Database configuration: primary/replica binds, SQLite tuning, lock retries.
+
+Every new SQLite connection gets WAL journaling (readers no longer block
+behind a writer), ``synchronous=NORMAL``, a busy timeout and larger page
+cache / mmap windows. File databases get a sized connection pool.
+
+Config:
+    DATABASE_REPLICA_URLS   read-only replica URIs, served to @read_only views
+    SQLITE_PRAGMAS      pragma name -> value, applied on connect ({} disables)
+    DB_POOL_SIZE        pooled connections kept open (default 10)
+    DB_MAX_OVERFLOW     extra connections allowed under burst (default 20)
+    DB_POOL_TIMEOUT     seconds to wait for a pooled connection (default 30)
+    DB_LOCK_RETRIES     retries for a write that hits "database is locked" (default 5)
+    DB_LOCK_BACKOFF     first retry delay in seconds, doubled each time (default 0.05)
+"""
+import functools
+import random
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from .changes import on_commit
+from .models import db
+from .routing import REPLICA_PREFIX, stick_to_primary
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,          # ms
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,      # negative = KiB, i.e. 64 MiB
+    "temp_store": "MEMORY",
+}
+
+
+def _is_sqlite_file(uri):
+    return uri.startswith("sqlite") and ":memory:" not in uri and not uri.endswith("://")
+
+
+def configure_engine(app):
+    """Fill in engine options; call before ``db.init_app``."""
+    app.config.setdefault("SQLITE_PRAGMAS", dict(DEFAULT_PRAGMAS))
+    app.config.setdefault("DB_LOCK_RETRIES", 5)
+    app.config.setdefault("DB_LOCK_BACKOFF", 0.05)
+
+    binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+    for i, replica in enumerate(app.config.get("DATABASE_REPLICA_URLS", [])):
+        binds.setdefault(f"{REPLICA_PREFIX}{i}", replica)
+
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    if _is_sqlite_file(uri):
+        options.setdefault("pool_size", app.config.setdefault("DB_POOL_SIZE", 10))
+        options.setdefault("max_overflow", app.config.setdefault("DB_MAX_OVERFLOW", 20))
+        options.setdefault("pool_timeout", app.config.setdefault("DB_POOL_TIMEOUT", 30))
+        # Connections are handed between request threads by the pool
+        connect_args = options.setdefault("connect_args", {})
+        connect_args.setdefault("check_same_thread", False)
+        connect_args.setdefault("timeout", app.config["SQLITE_PRAGMAS"].get("busy_timeout", 5000) / 1000)
+
+
+def install_pragmas(app):
+    """Apply SQLITE_PRAGMAS to every connection of the app's SQLite engines."""
+    pragmas = app.config["SQLITE_PRAGMAS"]
+    if not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", set_pragmas)
+
+
+def is_locked_error(error):
+    message = str(getattr(error, "orig", error)).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def retry_on_locked(view):
+    """Re-run a write view when SQLite reports the database as locked.
+
+    The session is rolled back before each retry and the delay doubles, with
+    jitter so competing writers do not retry in lockstep.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config.get("DB_LOCK_RETRIES", 5)
+        delay = current_app.config.get("DB_LOCK_BACKOFF", 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                db.session.rollback()
+                if attempt == retries or not is_locked_error(e):
+                    raise
+                time.sleep(delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+    return wrapper
+
+
+@on_commit
+def _read_your_writes(changes):
+    # The client that just wrote should not read a lagging replica next
+    stick_to_primary()
@@ -0,0 +1,125 @@
+# server/facets.py
+"""Facet counts for storefront navigation.
+
+``product_facets`` holds, per category, brand and price bucket, how many
+products there are and how many are in stock. Triggers on ``products`` keep
+the counts current inside the writing transaction. This covers ORM writes
+(create_product) and the Core stock decrements at checkout alike. The update
+trigger only fires when a product moves between facets or goes in or out of
+stock, so an ordinary stock decrement costs nothing extra.
+
+Reading the facets is one scan of this small table, independent of catalog
+size.
+"""
+from sqlalchemy import event
+
+from .models import db, ProductFacet
+
+# Upper bounds of the price buckets; the last bucket is open-ended. A bucket
+# holds low <= price < high, the same range as ?min_price=low&price_lt=high
+PRICE_BUCKETS = (25, 50, 100, 250, 500, 1000)
+
+
+def bucket_label(low, high):
+    return f"{low:g}-{high:g}" if high is not None else f"{low:g}+"
+
+
+def _buckets():
+    lows = (0,) + PRICE_BUCKETS
+    highs = PRICE_BUCKETS + (None,)
+    return [(bucket_label(low, high), low, high) for low, high in zip(lows, highs)]
+
+
+BUCKETS = _buckets()
+
+
+def _bucket_sql(price):
+    whens = " ".join(
+        f"WHEN {price} < {high:g} THEN '{label}'" for label, _, high in BUCKETS if high is not None
+    )
+    return f"CASE {whens} ELSE '{BUCKETS[-1][0]}' END"
+
+
+def _facet_values(row):
+    return {
+        "category": f"coalesce({row}.category, '')",
+        "brand": f"coalesce({row}.brand, '')",
+        "price": _bucket_sql(f"{row}.price"),
+    }
+
+
+_UPSERT = (
+    "ON CONFLICT (facet, value) DO UPDATE SET "
+    "products = product_facets.products + excluded.products, "
+    "in_stock = product_facets.in_stock + excluded.in_stock"
+)
+
+
+def _count_sql(row, sign):
+    """Statements adding ``sign`` (+1/-1) of product ``row`` to its facets."""
+    return "".join(
+        "INSERT INTO product_facets (facet, value, products, in_stock) "
+        f"VALUES ('{facet}', {value}, {sign}, {sign} * (coalesce({row}.stock, 0) > 0)) "
+        f"{_UPSERT}; "
+        for facet, value in _facet_values(row).items()
+    )
+
+
+DDL = [
+    "CREATE TRIGGER IF NOT EXISTS product_facets_insert AFTER INSERT ON products "
+    f"BEGIN {_count_sql('new', 1)}END",
+    "CREATE TRIGGER IF NOT EXISTS product_facets_delete AFTER DELETE ON products "
+    f"BEGIN {_count_sql('old', -1)}END",
+    "CREATE TRIGGER IF NOT EXISTS product_facets_update "
+    "AFTER UPDATE OF category, brand, price, stock ON products "
+    "WHEN old.category IS NOT new.category OR old.brand IS NOT new.brand "
+    "OR old.price IS NOT new.price "
+    "OR (coalesce(old.stock, 0) > 0) <> (coalesce(new.stock, 0) > 0) "
+    f"BEGIN {_count_sql('old', -1)}{_count_sql('new', 1)}END",
+]
+
+
+# Bulk imports drop this trigger for the length of a batch and count the
+# batch with count_range instead (see server/bulk.py)
+INSERT_TRIGGER = ("product_facets_insert", DDL[0])
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_triggers(target, connection, **kw):
+    # Databases built with db.create_all() get the triggers too; migrations
+    # create them for everything else.
+    if connection.dialect.name == "sqlite":
+        for statement in DDL:
+            connection.exec_driver_sql(statement)
+
+
+def count_range(connection, first_id, last_id):
+    """Add the products with ids ``first_id..last_id`` to the facet counts."""
+    for facet, value in _facet_values("products").items():
+        connection.exec_driver_sql(
+            "INSERT INTO product_facets (facet, value, products, in_stock) "
+            f"SELECT '{facet}', {value}, count(*), sum(coalesce(stock, 0) > 0) FROM products "
+            f"WHERE id BETWEEN ? AND ? GROUP BY 2 {_UPSERT}",
+            (first_id, last_id),
+        )
+
+
+def facet_counts():
+    """Every non-empty facet value with its product and in-stock counts."""
+    facets = {"category": [], "brand": [], "price": []}
+    rows = db.session.execute(
+        db.select(ProductFacet.facet, ProductFacet.value, ProductFacet.products, ProductFacet.in_stock)
+        .where(ProductFacet.products > 0)
+    )
+    for facet, value, products, in_stock in rows:
+        if value and facet in facets:
+            facets[facet].append({"value": value, "count": products, "in_stock": in_stock})
+
+    for facet in ("category", "brand"):
+        facets[facet].sort(key=lambda entry: (-entry["count"], entry["value"]))
+    # Price buckets in price order, with the bounds to filter the listing by
+    bounds = {label: (low, high) for label, low, high in BUCKETS}
+    for entry in facets["price"]:
+        entry["min_price"], entry["price_lt"] = bounds.get(entry["value"], (None, None))
+    facets["price"].sort(key=lambda entry: entry["min_price"] or 0)
+    return facets
@@ -0,0 +1,181 @@
+# server/idempotency.py
+"""Idempotency-Key support for writes that must not run twice.
+
+Clients retry checkouts and orders on timeouts without knowing whether the
+first attempt went through. A request sent with an ``Idempotency-Key``
+header claims that key (per acting user, method and path) before the view
+runs, and its response is stored under the key. A retry with the same key gets the
+stored response back, marked ``Idempotent-Replayed: true``, after one
+primary-key lookup. The view never runs again, so the retry never touches
+products, stock or order items.
+
+The acting user is the bearer token's, or else the one named by the
+route's ``username`` URL parameter or JSON field. Two users sending the
+same key never see each other's responses. Requests naming an unknown user
+run without a claim, and the view turns them away.
+
+- Reusing a key for a different request body is rejected with 422.
+- A retry that arrives while the first request is still running gets 409
+  with ``Retry-After``.
+- Responses with a 5xx status (or an exception) release the key, so the
+  retry runs for real.
+- A claim is only leased for ``IDEMPOTENCY_LEASE`` seconds until its
+  response is stored. A worker that dies mid-request blocks retries for
+  that long, not for the whole TTL. The lease must exceed the slowest
+  checkout: a retry after it ends runs the view again even if the first
+  request is still going, and both write an order.
+- Each claim carries a random token and only its holder stores or releases
+  the key, so a request that outlived its lease cannot overwrite or delete
+  the claim that took over from it.
+
+Keys live in ``idempotency_keys``, so every worker sees them, and expire
+after ``IDEMPOTENCY_TTL`` seconds. An expired key can be claimed again, and
+expired rows are purged at most once a minute per process.
+
+Config:
+    IDEMPOTENCY_TTL     seconds a stored response is replayed (default 86400)
+    IDEMPOTENCY_LEASE   seconds an unfinished claim blocks retries (default 60)
+"""
+import functools
+import hashlib
+import secrets
+import threading
+import time
+
+from flask import current_app, jsonify, request
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from .auth import resolve_user_id
+from .models import db, IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL = 60
+
+# Claims a new key, or takes over one whose lease or response has expired
+_CLAIM = text(
+    "INSERT INTO idempotency_keys (key, fingerprint, expires_at, token) "
+    "VALUES (:key, :fingerprint, :expires_at, :token) "
+    "ON CONFLICT (key) DO UPDATE SET fingerprint = excluded.fingerprint, "
+    "status = NULL, body = NULL, mimetype = NULL, expires_at = excluded.expires_at, "
+    "token = excluded.token "
+    "WHERE idempotency_keys.expires_at <= :now"
+)
+
+_table = IdempotencyKey.__table__
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def _purge(now):
+    global _last_purge
+    with _purge_lock:
+        if now - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = now
+    db.session.execute(_table.delete().where(_table.c.expires_at <= now))
+
+
+def _claim(key, fingerprint):
+    """Claim ``key``; returns ``(claim token or None, stored row or None)``."""
+    now = time.time()
+    _purge(now)
+    lease = current_app.config.get("IDEMPOTENCY_LEASE", 60)
+    token = secrets.token_hex(16)
+    result = db.session.execute(_CLAIM, {
+        "key": key, "fingerprint": fingerprint, "expires_at": now + lease, "token": token, "now": now,
+    })
+    db.session.commit()
+    if result.rowcount == 1:
+        return token, None
+    return None, db.session.execute(
+        db.select(_table.c.fingerprint, _table.c.status, _table.c.body, _table.c.mimetype)
+        .where(_table.c.key == key)
+    ).first()
+
+
+def _replay(stored, fingerprint):
+    if stored is not None and stored.fingerprint != fingerprint:
+        return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+    if stored is None or stored.status is None:
+        # Still running, or released by a failure a moment ago
+        response = jsonify({"error": f"A request with this {HEADER} is in progress"})
+        response.status_code = 409
+        response.headers["Retry-After"] = "1"
+        return response
+    response = current_app.response_class(stored.body, status=stored.status, mimetype=stored.mimetype)
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _store(key, token, response):
+    try:
+        result = db.session.execute(
+            _table.update().where(_table.c.key == key, _table.c.token == token).values(
+                status=response.status_code,
+                body=response.get_data(as_text=True),
+                mimetype=response.mimetype,
+                expires_at=time.time() + current_app.config.get("IDEMPOTENCY_TTL", 86400),
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 0:
+            current_app.logger.warning("Lease on %s ran out before its response was stored", key)
+    except OperationalError:
+        # The write itself went through; retries see 409 until the lease ends
+        db.session.rollback()
+        current_app.logger.exception("Could not store the response for %s", key)
+
+
+def _release(key, token):
+    db.session.rollback()
+    db.session.execute(_table.delete().where(
+        _table.c.key == key, _table.c.token == token, _table.c.status.is_(None)
+    ))
+    db.session.commit()
+
+
+def _acting_user():
+    username = (request.view_args or {}).get("username")
+    if username is None:
+        body = request.get_json(silent=True)
+        username = body.get("username") if isinstance(body, dict) else None
+    return resolve_user_id(username)
+
+
+def idempotent(view):
+    """Replay the stored response for requests repeating an Idempotency-Key.
+
+    Goes outside ``retry_on_locked`` so lock retries run under one claim.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get(HEADER)
+        if client_key is None:
+            return view(*args, **kwargs)
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters"}), 400
+
+        user_id = _acting_user()
+        if user_id is None:
+            return view(*args, **kwargs)
+
+        key = f"{user_id} {request.method} {request.path} {client_key}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        token, stored = _claim(key, fingerprint)
+        if token is None:
+            return _replay(stored, fingerprint)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            _release(key, token)
+            raise
+        if response.status_code >= 500:
+            _release(key, token)
+        else:
+            _store(key, token, response)
+        return response
+    return wrapper
@@ -0,0 +1,211 @@
+# server/listing.py
+import base64
+import binascii
+import json
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import tuple_
+
+from .models import Product
+from .serializers import row_dict
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# Columns a client may ask for with ?fields=
+FIELDS = {
+    "id": Product.id,
+    "name": Product.name,
+    "price": Product.price,
+    "description": Product.description,
+    "image_url": Product.image_url,
+    "category": Product.category,
+    "brand": Product.brand,
+    "stock": Product.stock,
+    "created_at": Product.created_at,
+}
+
+# Keyset orderings; every one is tie-broken on id so the cursor is unique
+SORTS = {
+    "created_at": Product.created_at,
+    "price": Product.price,
+}
+
+
+class ListingError(ValueError):
+    """Bad query parameters for the product listing."""
+
+
+# -------------------- Cursors --------------------
+def encode_cursor(value, id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, id = json.loads(raw)
+        if sort == "created_at":
+            value = datetime.fromisoformat(value)
+        return value, int(id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ListingError("Invalid cursor")
+
+
+# -------------------- Parameters --------------------
+def _parse_number(args, key, cast):
+    value = args.get(key)
+    if value in (None, ""):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ListingError(f"Invalid {key}")
+
+
+def _parse_fields(args):
+    fields = args.get("fields")
+    if not fields:
+        return list(FIELDS)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FIELDS]
+    if unknown:
+        raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _parse_sort(args):
+    sort = args.get("sort", "created_at")
+    descending = sort.startswith("-")
+    sort = sort.lstrip("-")
+    if sort not in SORTS:
+        raise ListingError(f"Cannot sort by {sort}")
+    return sort, descending
+
+
+def _split(value):
+    return [v for v in value.split(",") if v] if value else []
+
+
+# -------------------- Listing --------------------
+def product_query(args):
+    """Build the filtered, projected and ordered listing query for ``args``.
+
+    Returns ``(query, fields, sort)``. The cursor, if any, is applied, but no
+    limit is.
+    """
+    fields = _parse_fields(args)
+    sort, descending = _parse_sort(args)
+    sort_col = SORTS[sort]
+
+    # The sort key and id are always selected so the next cursor can be built
+    selected = list(dict.fromkeys(fields + [sort, "id"]))
+    query = Product.query.with_entities(*(FIELDS[f].label(f) for f in selected))
+
+    categories = _split(args.get("category"))
+    if categories:
+        query = query.filter(Product.category.in_(categories))
+    brands = _split(args.get("brand"))
+    if brands:
+        query = query.filter(Product.brand.in_(brands))
+    min_price = _parse_number(args, "min_price", float)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    max_price = _parse_number(args, "max_price", float)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    # Exclusive upper bound, for the facet price buckets
+    price_lt = _parse_number(args, "price_lt", float)
+    if price_lt is not None:
+        query = query.filter(Product.price < price_lt)
+
+    key = tuple_(sort_col, Product.id)
+    cursor = args.get("cursor")
+    if cursor:
+        after = decode_cursor(cursor, sort)
+        query = query.filter(key < after if descending else key > after)
+
+    if descending:
+        query = query.order_by(sort_col.desc(), Product.id.desc())
+    else:
+        query = query.order_by(sort_col, Product.id)
+    return query, fields, sort
+
+
+def list_products(args):
+    """Fetch one page of products.
+
+    Filtering, ordering and the column projection all happen in SQL, and the
+    page is located with a keyset cursor rather than an OFFSET, so the cost of
+    a page does not depend on how deep into the catalog it is.
+
+    Returns ``(items, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    limit = _parse_number(args, "limit", int)
+    if limit is None:
+        limit = DEFAULT_LIMIT
+    if limit < 1:
+        raise ListingError("Invalid limit")
+    limit = min(limit, MAX_LIMIT)
+
+    query, fields, sort = product_query(args)
+
+    # One extra row tells us whether another page exists
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort), last.id)
+
+    return serialize_rows(rows, fields), next_cursor
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def stream_products(args, batch_size=1000):
+    """Every product matching ``args`` (no page limit), fetched in batches.
+
+    Parameters are validated up front; rows are only read as the returned
+    iterator is consumed.
+    """
+    query, fields, sort = product_query(args)
+    return (
+        item
+        for batch in _batches(query.yield_per(batch_size), batch_size)
+        for item in serialize_rows(batch, fields)
+    )
+
+
+def product_detail(id):
+    """One product as a plain dict, read without building an ORM object."""
+    row = (
+        Product.query.with_entities(*(col.label(name) for name, col in FIELDS.items()))
+        .filter(Product.id == id)
+        .first()
+    )
+    return serialize_rows([row], FIELDS)[0] if row else None
+
+
+def serialize_rows(rows, fields):
+    """``fields`` of each product row as a dict, with sharded products' live stock.
+
+    Every row must have an ``id`` column, selected or not.
+    """
+    from .stock_shards import current_stock  # stock_shards imports this module
+
+    items = [row_dict(row, fields) for row in rows]
+    if "stock" in fields:
+        totals = current_stock([row.id for row in rows])
+        for row, item in zip(rows, items):
+            if row.id in totals:
+                item["stock"] = totals[row.id]
+    return items
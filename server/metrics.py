@@ -0,0 +1,222 @@
+# server/metrics.py
+"""Per-route latency, SQL and serialization metrics, served at /metrics.
+
+For every request this records:
+
+- wall time (including any streamed body) in a histogram per endpoint
+- the number of SQL statements and the time spent in them, from the
+  engines' ``before_cursor_execute``/``after_cursor_execute`` events
+- the number of rows serialized into the response
+
+The totals are exposed in the Prometheus text format at ``GET /metrics``.
+Each worker process keeps its own registry, so scrape every worker.
+
+With ``PROFILING_ENABLED`` a request sent with ``X-Profile: 1`` also runs
+under cProfile. The stats are written to ``PROFILE_DIR`` and the file name
+comes back in the ``X-Profile-File`` header; open it with ``pstats`` or
+snakeviz.
+
+Config:
+    METRICS_ENABLED     record metrics and serve /metrics (default True)
+    PROFILING_ENABLED   honour the X-Profile header (default False)
+    PROFILE_DIR         where profiles are written (default: system temp dir)
+
+With METRICS_ENABLED off no hooks or listeners are installed at all.
+"""
+import cProfile
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from types import GeneratorType
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from .models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_HEADER = "X-Profile"
+
+
+class RequestStats:
+    __slots__ = (
+        "start", "status", "streamed", "statements", "sql_seconds", "rows", "profile", "profile_path",
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = 500  # until a response is made
+        self.streamed = False
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.profile = None
+        self.profile_path = None
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def record_rows(count):
+    """Add ``count`` serialized rows to the current request's tally."""
+    stats = g.get("request_stats") if has_request_context() else None
+    if stats is not None:
+        stats.rows += count
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def reset(self):
+        with self._lock:
+            self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.requests = defaultdict(int)
+            self.statements = defaultdict(int)
+            self.sql_seconds = defaultdict(float)
+            self.rows = defaultdict(int)
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault("METRICS_ENABLED", True)
+        self.profiling = app.config.setdefault("PROFILING_ENABLED", False)
+        self.profile_dir = app.config.setdefault("PROFILE_DIR", tempfile.gettempdir())
+        app.extensions["metrics"] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule("/metrics", "metrics", self._view, methods=["GET"])
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # -------------------- Request hooks --------------------
+    def _start(self):
+        stats = g.request_stats = RequestStats()
+        if self.profiling and request.headers.get(PROFILE_HEADER) == "1":
+            # One profile at a time; cProfile cannot nest across threads
+            if self._profile_lock.acquire(blocking=False):
+                stats.profile = cProfile.Profile()
+                stats.profile.enable()
+
+    def _finish(self, response):
+        stats = g.get("request_stats")
+        if stats is None:
+            return response
+        stats.status = response.status_code
+        if stats.profile is not None:
+            stats.profile_path = os.path.join(
+                self.profile_dir,
+                f"{request.endpoint or 'unmatched'}-{int(time.time() * 1000)}-{os.getpid()}.prof",
+            )
+            response.headers["X-Profile-File"] = stats.profile_path
+        if isinstance(response.response, GeneratorType):
+            # A streamed body is generated after this request's teardown;
+            # finish once the server has sent all of it
+            stats.streamed = True
+            endpoint, method = request.endpoint or "unmatched", request.method
+            response.call_on_close(lambda: self._complete(endpoint, method, stats))
+        return response
+
+    def _teardown(self, exc):
+        stats = g.get("request_stats")
+        if stats is not None and not stats.streamed:
+            self._complete(request.endpoint or "unmatched", request.method, stats)
+
+    def _complete(self, endpoint, method, stats):
+        if stats.profile is not None:
+            stats.profile.disable()
+            if stats.profile_path:
+                stats.profile.dump_stats(stats.profile_path)
+            stats.profile = None
+            self._profile_lock.release()
+        self.observe(endpoint, method, stats)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context.query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_start
+        stats = g.get("request_stats") if has_request_context() else None
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+
+    # -------------------- Registry --------------------
+    def observe(self, endpoint, method, stats):
+        elapsed = time.perf_counter() - stats.start
+        key = (endpoint, method)
+        with self._lock:
+            self.latency[key].observe(elapsed)
+            self.requests[(endpoint, method, stats.status)] += 1
+            self.statements[key] += stats.statements
+            self.sql_seconds[key] += stats.sql_seconds
+            self.rows[key] += stats.rows
+
+    def render(self):
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP cartify_request_duration_seconds Request latency, including streamed bodies.",
+                "# TYPE cartify_request_duration_seconds histogram",
+            ]
+            for (endpoint, method), hist in sorted(self.latency.items()):
+                labels = _labels(endpoint=endpoint, method=method)
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'cartify_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'cartify_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"cartify_request_duration_seconds_sum{{{labels}}} {hist.sum}")
+                lines.append(f"cartify_request_duration_seconds_count{{{labels}}} {hist.count}")
+
+            lines += [
+                "# HELP cartify_requests_total Requests by endpoint and status.",
+                "# TYPE cartify_requests_total counter",
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                labels = _labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f"cartify_requests_total{{{labels}}} {count}")
+
+            for name, help_, values in (
+                ("cartify_sql_statements_total", "SQL statements executed.", self.statements),
+                ("cartify_sql_seconds_total", "Time spent executing SQL.", self.sql_seconds),
+                ("cartify_rows_serialized_total", "Rows serialized into responses.", self.rows),
+            ):
+                lines += [f"# HELP {name} {help_}", f"# TYPE {name} counter"]
+                for (endpoint, method), value in sorted(values.items()):
+                    lines.append(f"{name}{{{_labels(endpoint=endpoint, method=method)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _view(self):
+        return current_app.response_class(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics = Metrics()
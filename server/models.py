@@ -1,11 +1,12 @@
 # server/models.py
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from flask_bcrypt import Bcrypt
 from sqlalchemy.orm import validates
+from .serializers import row_dict
+from .passwords import password_hasher
+from .routing import RoutingSession
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 # ---------------- USER ----------------
@@ -26,10 +27,14 @@ class User(db.Model):
 
     @password.setter
     def password(self, plaintext):
-        self._password_hash = bcrypt.generate_password_hash(plaintext).decode("utf-8")
+        self._password_hash = password_hasher.hash(plaintext)
 
     def check_password(self, plaintext):
-        return bcrypt.check_password_hash(self._password_hash, plaintext)
+        return password_hasher.check(self._password_hash, plaintext)
+
+    @property
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self._password_hash)
 
     def to_dict(self):
         return {
@@ -41,35 +46,44 @@ class User(db.Model):
 
 
 # ---------------- PRODUCT ----------------
+def check_price(value):
+    if value <= 0:
+        raise ValueError("Price must be greater than 0")
+    return value
+
+
+def check_stock(value):
+    if value < 0:
+        raise ValueError("Stock cannot be negative")
+    return value
+
+
 class Product(db.Model):
     __tablename__ = "products"
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     description = db.Column(db.String, nullable=True)
     image_url = db.Column(db.String, nullable=True)
-    category = db.Column(db.String, nullable=True)
-    brand = db.Column(db.String, nullable=True)
+    category = db.Column(db.String, nullable=True, index=True)
+    brand = db.Column(db.String, nullable=True, index=True)
     stock = db.Column(db.Integer, default=0)  # ✅ new field
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     cart_items = db.relationship("CartItem", back_populates="product")
     order_items = db.relationship("OrderItem", back_populates="product")
 
     @validates("price")
     def validate_price(self, key, value):
-        if value <= 0:
-            raise ValueError("Price must be greater than 0")
-        return value
+        return check_price(value)
 
     @validates("stock")
     def validate_stock(self, key, value):
-        if value < 0:
-            raise ValueError("Stock cannot be negative")
-        return value
+        return check_stock(value)
 
     def to_dict(self):
+        from .stock_shards import display_stock  # stock_shards imports this module
         return {
             "id": self.id,
             "name": self.name,
@@ -78,7 +92,7 @@ class Product(db.Model):
             "image_url": self.image_url,
             "category": self.category,
             "brand": self.brand,
-            "stock": self.stock,  # ✅ include in response
+            "stock": display_stock(self),  # ✅ include in response
             "created_at": self.created_at.isoformat()
         }
 
@@ -86,6 +100,9 @@ class Product(db.Model):
 # ---------------- CART ITEM ----------------
 class CartItem(db.Model):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "product_id", name="uq_cart_items_user_id_product_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
@@ -106,20 +123,36 @@ class CartItem(db.Model):
         }
 
 
+def cart_contents(user_id, batch_size=1000):
+    """A user's cart as plain dicts (same keys as ``CartItem.to_dict``).
+
+    One joined, column-projected query; rows are fetched in batches.
+    """
+    rows = db.session.execute(
+        db.select(
+            CartItem.id, CartItem.user_id, CartItem.product_id,
+            Product.name.label("product_name"), Product.price, Product.image_url,
+            CartItem.quantity,
+        )
+        .join(Product, CartItem.product_id == Product.id)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+        .execution_options(yield_per=batch_size)
+    )
+    return (row_dict(row) for row in rows)
+
+
 # ---------------- ORDER ----------------
 class Order(db.Model):
     __tablename__ = "orders"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    total = db.Column(db.Float, nullable=False, default=0)  # sum of item price * quantity when ordered
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     items = db.relationship("OrderItem", backref="order", lazy=True)
 
-    @property
-    def total(self):
-        return sum(item.product.price * item.quantity for item in self.items)
-
     def to_dict(self):
         return {
             "id": self.id,
@@ -130,14 +163,58 @@ class Order(db.Model):
         }
 
 
+def order_history(user_id, batch_size=500):
+    """Serialize every order for a user, lazily and in batches.
+
+    Orders are read ``batch_size`` at a time as plain column rows, and the
+    items of each batch (joined to their product's name and image) come from
+    one IN query. No ORM objects are built, the query count is constant per
+    batch, and memory stays flat however many orders the user has.
+    """
+    orders = db.session.execute(
+        db.select(Order.id, Order.user_id, Order.total, Order.created_at)
+        .where(Order.user_id == user_id)
+        .order_by(Order.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for batch in orders.partitions():
+        items = {}
+        rows = db.session.execute(
+            db.select(
+                OrderItem.order_id, OrderItem.id, Product.name.label("product"),
+                OrderItem.price, Product.image_url, OrderItem.quantity,
+            )
+            .join(Product, OrderItem.product_id == Product.id)
+            .where(OrderItem.order_id.in_([order.id for order in batch]))
+            .order_by(OrderItem.id)
+        )
+        for row in rows:
+            items.setdefault(row.order_id, []).append(row_dict(row, ORDER_ITEM_FIELDS))
+        for order in batch:
+            yield {
+                "id": order.id,
+                "user_id": order.user_id,
+                "items": items.get(order.id, []),
+                "total": order.total,
+                "created_at": order.created_at,
+            }
+
+
 # ---------------- ORDER ITEM ----------------
+ORDER_ITEM_FIELDS = ("id", "product", "price", "image_url", "quantity")
+
+
 class OrderItem(db.Model):
     __tablename__ = "order_items"
+    __table_args__ = (
+        db.Index("ix_order_items_order_id_product_id", "order_id", "product_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     quantity = db.Column(db.Integer, default=1)
+    price = db.Column(db.Float, nullable=False)  # unit price when ordered
 
     product = db.relationship("Product", back_populates="order_items")
 
@@ -145,7 +222,85 @@ class OrderItem(db.Model):
         return {
             "id": self.id,
             "product": self.product.name,
-            "price": self.product.price,
+            "price": self.price,
             "image_url": self.product.image_url,
             "quantity": self.quantity
         }
+
+
+# ---------------- TABLE VERSION ----------------
+class TableVersion(db.Model):
+    """Write counter per cache scope (e.g. "products", "orders:42").
+
+    Bumped in the same transaction as the write, so it is a cheap, strong
+    validator for conditional GETs across every worker process.
+    """
+    __tablename__ = "table_versions"
+
+    scope = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ---------------- PRODUCT FACET ----------------
+class ProductFacet(db.Model):
+    """Product counts per category, brand and price bucket.
+
+    Kept current by triggers on ``products`` (see server/facets.py), so the
+    storefront filters read a few dozen rows instead of grouping the catalog.
+    """
+    __tablename__ = "product_facets"
+
+    facet = db.Column(db.String, primary_key=True)  # "category", "brand" or "price"
+    value = db.Column(db.String, primary_key=True)
+    products = db.Column(db.Integer, nullable=False, default=0)
+    in_stock = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ---------------- STOCK RESERVATION ----------------
+class StockReservation(db.Model):
+    """A cart hold on product stock, persisted from the in-memory ledger.
+
+    The ledger in server/reservations.py is authoritative while the process
+    runs; this table lets holds survive a restart.
+    """
+    __tablename__ = "stock_reservations"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False)  # Unix time
+
+
+# ---------------- STOCK SHARD ----------------
+class StockShard(db.Model):
+    """One slice of a hot product's stock (see server/stock_shards.py).
+
+    A sharded product's real stock is the sum of its shards; checkouts
+    decrement a random shard so concurrent buyers update different rows.
+    """
+    __tablename__ = "product_stock_shards"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    stock = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ---------------- IDEMPOTENCY KEY ----------------
+class IdempotencyKey(db.Model):
+    """The stored response for a request sent with an Idempotency-Key.
+
+    ``status`` is NULL while the first request is still being processed
+    (see server/idempotency.py).
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        db.Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    key = db.Column(db.String, primary_key=True)  # "<user id> <method> <path> <client key>"
+    fingerprint = db.Column(db.String, nullable=False)  # hash of the request body
+    status = db.Column(db.Integer)
+    body = db.Column(db.Text)
+    mimetype = db.Column(db.String)
+    expires_at = db.Column(db.Float, nullable=False)  # Unix time; the lease end while status is NULL
+    token = db.Column(db.String)  # random per claim; only its holder may store or release the key
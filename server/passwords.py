@@ -0,0 +1,106 @@
+# server/passwords.py
+"""bcrypt hashing off the request thread.
+
+Hashes and checks run in a small process pool so a burst of logins does not
+pin request threads (or the GIL) on bcrypt's CPU work. The number of calls
+waiting for the pool is capped; past the cap ``PoolSaturated`` is raised and
+the app answers 503 instead of queueing without bound.
+
+Config:
+    BCRYPT_LOG_ROUNDS       work factor for new hashes (default 12)
+    PASSWORD_POOL_WORKERS   worker processes; 0 hashes inline (default: CPUs)
+    PASSWORD_POOL_QUEUE     calls allowed in flight before 503 (default: 4x workers)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+# bcrypt only looks at the first 72 bytes; newer releases raise instead of
+# truncating, so truncate here to keep existing hashes valid
+MAX_PASSWORD_BYTES = 72
+
+
+class PoolSaturated(Exception):
+    """Too many password operations are already waiting for the pool."""
+
+
+def _encode(plaintext):
+    return plaintext.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def _hash(plaintext, rounds):
+    return bcrypt.hashpw(_encode(plaintext), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(pw_hash, plaintext):
+    return bcrypt.checkpw(_encode(plaintext), pw_hash.encode("utf-8"))
+
+
+def hash_rounds(pw_hash):
+    """The work factor a bcrypt hash was made with ("$2b$12$..." -> 12)."""
+    try:
+        return int(pw_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = os.cpu_count() or 1
+        self.max_pending = self.workers * 4
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.setdefault("BCRYPT_LOG_ROUNDS", 12)
+        self.workers = app.config.setdefault("PASSWORD_POOL_WORKERS", os.cpu_count() or 1)
+        self.max_pending = app.config.setdefault("PASSWORD_POOL_QUEUE", max(self.workers, 1) * 4)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions["password_hasher"] = self
+
+    def _pool(self):
+        # Created on first use so forking servers do not inherit a live pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated("Too many password operations in progress")
+        try:
+            if not self.workers:
+                return fn(*args)
+            return self._pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, plaintext):
+        return self._run(_hash, plaintext, self.rounds)
+
+    def check(self, pw_hash, plaintext):
+        if not pw_hash or plaintext is None:
+            return False
+        return self._run(_check, pw_hash, plaintext)
+
+    def needs_rehash(self, pw_hash):
+        return hash_rounds(pw_hash) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,179 @@
+# server/query_plan.py
+"""EXPLAIN QUERY PLAN check for the API routes.
+
+Runs every route against a scratch SQLite database, asks SQLite for the plan
+of each statement the route issues, and reports any statement that has to
+scan a whole table, and any route that does not answer with its expected
+status (a route that fails early never runs its real queries). Exits
+non-zero when it finds either, so it can gate CI:
+
+    python -m server.query_plan
+
+tests/test_query_plan.py runs the same check under pytest.
+"""
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# "SCAN products" ("SCAN TABLE products" before SQLite 3.36) is a full table
+# scan; "SCAN products USING [COVERING] INDEX ..." walks an index in order
+# (e.g. for ORDER BY ... LIMIT) and is fine.
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "INSERT")
+
+# Summary tables that are small by design and read whole
+SMALL_TABLES = {"product_facets"}
+
+# Routes that dump whole tables by design
+EXPORT_ROUTES = {"/products/export"}
+
+
+def explain(dbapi_connection, statement, parameters=()):
+    """Return the detail column of SQLite's EXPLAIN QUERY PLAN."""
+    rows = dbapi_connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan, tables):
+    """Tables from ``tables`` that ``plan`` reads without an index."""
+    scans = []
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if match and match.group(1) in tables:
+            scans.append(match.group(1))
+    return scans
+
+
+@contextmanager
+def record_plans(engine, tables):
+    """Collect ``(statement, scanned tables)`` for every full scan on ``engine``."""
+    offenders = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(EXPLAINED):
+            return
+        # executemany gets a list of rows; an insertmanyvalues batch is one flat row
+        many = executemany and parameters and isinstance(parameters[0], (list, tuple, dict))
+        params = parameters[0] if many else parameters
+        scans = full_scans(explain(cursor.connection, statement, params), tables)
+        if scans:
+            offenders.append((statement, scans))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield offenders
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _seed(db):
+    from .models import User, Product, CartItem
+
+    users = [
+        User(username="alice", email="alice@example.com", password="password"),
+        User(username="bob", email="bob@example.com", password="password"),
+    ]
+    products = [
+        Product(name=f"Product {i}", price=10 + i, category=f"Category {i % 3}",
+                brand=f"Brand {i % 4}", stock=100)
+        for i in range(12)
+    ]
+    db.session.add_all(users + products)
+    db.session.flush()
+    db.session.add_all([
+        CartItem(user_id=users[0].id, product_id=products[0].id, quantity=2),
+        CartItem(user_id=users[0].id, product_id=products[1].id, quantity=1),
+    ])
+    db.session.commit()
+
+
+# (method, path, json body, expected status) for every route, in an order
+# that leaves data for the next call to find. "{cursor}" is replaced with the
+# X-Next-Cursor of the last response that sent one.
+ROUTES = [
+    ("GET", "/products", None, 200),
+    ("GET", "/products?limit=5&sort=-price", None, 200),
+    ("GET", "/products?limit=5&sort=-price&cursor={cursor}", None, 200),
+    ("GET", "/products?category=Category%201&limit=5", None, 200),
+    ("GET", "/products?brand=Brand%202&fields=id,name", None, 200),
+    ("GET", "/products?min_price=12&max_price=15&sort=price&limit=2", None, 200),
+    ("GET", "/products?min_price=12&max_price=15&sort=price&limit=2&cursor={cursor}", None, 200),
+    ("GET", "/products?stream=true&category=Category%202", None, 200),
+    ("GET", "/products/1", None, 200),
+    ("GET", "/products/search?q=prod&limit=5", None, 200),
+    ("GET", "/products/facets", None, 200),
+    ("GET", "/products/export?format=csv", None, 200),
+    ("GET", "/products/export?format=jsonl", None, 200),
+    ("POST", "/products", {"name": "New", "price": 5, "stock": 3}, 201),
+    ("POST", "/signup", {"username": "carol", "email": "carol@example.com", "password": "pw"}, 201),
+    ("POST", "/login", {"username": "alice", "password": "password"}, 200),
+    ("GET", "/cart/alice", None, 200),
+    ("POST", "/cart", {"username": "alice", "product_id": 3, "quantity": 1}, 201),
+    ("POST", "/cart/batch", {"username": "alice", "items": [
+        {"product_id": 5, "quantity": 1}, {"product_id": 6, "quantity": 2},
+    ]}, 200),
+    ("PATCH", "/cart/1", {"quantity": 3}, 200),
+    ("DELETE", "/cart/2", None, 200),
+    ("POST", "/checkout/alice", None, 201),
+    ("POST", "/orders", {"username": "bob", "items": [{"product_id": 4, "quantity": 1}]}, 200),
+    ("GET", "/orders/alice", None, 200),
+    ("DELETE", "/orders/2", None, 200),
+]
+
+
+def check_routes():
+    """Exercise every route and return ``[(route, problem, statement or None)]``."""
+    from .app import create_app
+    from .models import db
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    try:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SECRET_KEY": "query-plan"})
+        client = app.test_client()
+        with app.app_context():
+            db.create_all(bind_key=None)
+            _seed(db)
+            tables = set(db.metadata.tables) - SMALL_TABLES
+            engine = db.engine
+
+        problems = []
+        cursor = ""
+        for method, url, body, status in ROUTES:
+            route = f"{method} {url}"
+            with record_plans(engine, tables) as offenders:
+                response = client.open(url.format(cursor=cursor), method=method, json=body)
+                response.get_data()  # streamed bodies run their queries here
+            cursor = response.headers.get("X-Next-Cursor", cursor)
+            if url.partition("?")[0] in EXPORT_ROUTES:
+                offenders = []
+            if response.status_code != status:
+                problems.append((route, f"returned {response.status_code}, expected {status}", None))
+            problems.extend(
+                (route, f"full scan of {', '.join(scans)}", statement) for statement, scans in offenders
+            )
+        return problems
+    finally:
+        os.remove(path)
+
+
+def main():
+    problems = check_routes()
+    for route, problem, statement in problems:
+        print(f"{route}: {problem}")
+        if statement:
+            print(f"    {' '.join(statement.split())}")
+    if problems:
+        print(f"{len(problems)} problem(s) found")
+        return 1
+    print("No full table scans")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
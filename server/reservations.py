@@ -0,0 +1,415 @@
+# server/reservations.py
+"""Short-lived stock reservations for cart lines.
+
+With ``RESERVATIONS_ENABLED`` every cart line holds its quantity against
+``Product.stock`` for ``RESERVATION_TTL`` seconds, renewed on every change
+to the line. A product's available stock is its stock minus everyone
+else's holds, so a shopper who got an item into the cart keeps it through
+checkout instead of losing it to a flash-sale stampede at the last step.
+
+Holds live in an in-memory ledger: per product, the reserved total and a
+stock snapshot, so availability is a dict lookup. A background sweeper
+expires holds, refreshes the stock snapshots and writes the ledger to
+``stock_reservations`` every ``RESERVATION_SWEEP_SECONDS``, and the ledger
+is reloaded from there on the first request after a restart.
+
+Checkout converts the user's holds in one step under the ledger lock. Holds
+are dropped when the order commits and restored if it rolls back. Ledger
+changes made during a request follow its transaction the same way.
+
+The ledger is per process, like ``CART_STORE=memory``: run one worker when
+it is enabled. Checkout's conditional stock UPDATE still guards against
+overselling either way.
+
+Config:
+    RESERVATIONS_ENABLED        hold stock for cart lines (default False)
+    RESERVATION_TTL             seconds a hold lasts without activity (default 900)
+    RESERVATION_SWEEP_SECONDS   sweeper and persistence interval (default 5)
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, tuple_
+
+from .cart import CartError, unavailable
+from .models import db, Product, StockReservation
+
+_PERSIST_CHUNK = 5000  # keys per DELETE, well inside SQLite's variable limit
+
+
+def _stage(kind, entry):
+    db.session.info.setdefault(kind, []).append(entry)
+
+
+class ReservationLedger:
+    """Holds keyed by ``(user_id, product_id)``, with per-product totals."""
+
+    def __init__(self, ttl, interval):
+        self.ttl = ttl
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._holds = {}     # (user_id, product_id) -> (quantity, expires_at)
+        self._reserved = {}  # product_id -> total held
+        self._stock = {}     # product_id -> stock snapshot
+        self._dirty = set()  # keys changed since the last flush
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -------------------- Ledger --------------------
+    def _set(self, key, quantity, expires_at):
+        """Set a hold (0 drops it); returns the previous one. Lock held."""
+        previous = self._holds.get(key)
+        product_id = key[1]
+        reserved = self._reserved.get(product_id, 0) + quantity - (previous[0] if previous else 0)
+        if quantity > 0:
+            self._holds[key] = (quantity, expires_at)
+        else:
+            self._holds.pop(key, None)
+        if reserved > 0:
+            self._reserved[product_id] = reserved
+        else:
+            self._reserved.pop(product_id, None)
+        self._dirty.add(key)
+        return previous
+
+    def _available(self, product_id, user_id):
+        """Stock not held by anyone but ``user_id``. Lock held."""
+        own = self._holds.get((user_id, product_id), (0,))[0]
+        return self._stock[product_id] - self._reserved.get(product_id, 0) + own
+
+    @contextmanager
+    def _locked(self, product_ids):
+        """Hold the lock, with a stock snapshot for every product that exists.
+
+        Snapshots are read outside the lock, and a sweep can forget them
+        before it is taken. What was read is filled in under the lock, and
+        anything forgotten in between is read again, so a product is never
+        taken for unknown just because its snapshot was being refreshed.
+        """
+        read = {}  # product_id -> stock, None for no such product
+        while True:
+            missing = [pid for pid in product_ids if pid not in read and pid not in self._stock]
+            if missing:
+                rows = dict(db.session.execute(
+                    db.select(Product.id, Product.stock).where(Product.id.in_(missing))
+                ).all())
+                read.update({pid: (rows[pid] or 0) if pid in rows else None for pid in missing})
+            self._lock.acquire()
+            for product_id, stock in read.items():
+                if stock is not None:
+                    self._stock.setdefault(product_id, stock)
+            if all(pid in read or pid in self._stock for pid in product_ids):
+                break
+            self._lock.release()
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def available(self, product_id, user_id=None):
+        """Units of a product that can still be put in a cart, or None if unknown."""
+        self._ensure_started()
+        with self._locked([product_id]):
+            if product_id not in self._stock:
+                return None
+            return max(self._available(product_id, user_id), 0)
+
+    def hold(self, user_id, product_id, quantity):
+        """Hold ``quantity`` units (the line's new total) for a user.
+
+        Raises CartError if other users' holds leave too little stock.
+        Returns the previous hold for ``restore``.
+        """
+        self._ensure_started()
+        key = (user_id, product_id)
+        with self._locked([product_id]):
+            if product_id not in self._stock:
+                raise CartError(unavailable(None))
+            available = self._available(product_id, user_id)
+            if quantity > available:
+                raise CartError(unavailable(max(available, 0)))
+            previous = self._set(key, quantity, time.time() + self.ttl)
+        _stage("reservation_undo", (self, key, previous))
+        return previous
+
+    def restore(self, user_id, product_id, previous):
+        with self._lock:
+            self._set((user_id, product_id), *(previous or (0, 0)))
+
+    def release(self, user_id, product_ids):
+        """Drop a user's holds on ``product_ids`` (all of them for None)."""
+        with self._lock:
+            if product_ids is None:
+                keys = [key for key in self._holds if key[0] == user_id]
+            else:
+                keys = [(user_id, product_id) for product_id in product_ids]
+            for key in keys:
+                if key in self._holds:
+                    self._set(key, 0, 0)
+
+    def convert(self, user_id, quantities):
+        """Claim ``{product_id: quantity}`` for a checkout, all or nothing.
+
+        Returns ``{product_id: available}`` for every line that cannot be
+        covered by the user's holds plus free stock; nothing is claimed then.
+        Otherwise the user holds exactly what is being bought, and the holds
+        turn into the stock decrement when the transaction commits.
+        """
+        self._ensure_started()
+        with self._locked(list(quantities)):
+            known = [pid for pid in quantities if pid in self._stock]
+            shortages = {
+                pid: max(self._available(pid, user_id), 0)
+                for pid in known
+                if quantities[pid] > self._available(pid, user_id)
+            }
+            if shortages:
+                return shortages
+            expires_at = time.time() + self.ttl
+            for pid in known:
+                key = (user_id, pid)
+                _stage("reservation_undo", (self, key, self._set(key, quantities[pid], expires_at)))
+                _stage("reservation_conversions", (self, key, quantities[pid]))
+        return {}
+
+    def _converted(self, key, quantity):
+        with self._lock:
+            held = self._holds.get(key)
+            if held is not None:
+                self._set(key, held[0] - quantity, held[1])
+            if key[1] in self._stock:
+                self._stock[key[1]] -= quantity
+
+    def forget_stock(self, product_ids=None):
+        """Drop stock snapshots so they are re-read (all of them for None)."""
+        with self._lock:
+            if product_ids is None:
+                self._stock.clear()
+            else:
+                for product_id in product_ids:
+                    self._stock.pop(product_id, None)
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for key in [key for key, (_, expires_at) in self._holds.items() if expires_at <= now]:
+                self._set(key, 0, 0)
+
+    # -------------------- Persistence --------------------
+    def load(self):
+        """Take over the unexpired holds persisted by a previous process."""
+        rows = db.session.execute(
+            db.select(
+                StockReservation.user_id, StockReservation.product_id,
+                StockReservation.quantity, StockReservation.expires_at,
+            ).where(StockReservation.expires_at > time.time())
+        ).all()
+        with self._lock:
+            for user_id, product_id, quantity, expires_at in rows:
+                self._set((user_id, product_id), quantity, expires_at)
+            self._dirty.clear()
+
+    def flush(self):
+        """Write the holds changed since the last flush to ``stock_reservations``."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [
+                {"user_id": key[0], "product_id": key[1], "quantity": quantity, "expires_at": expires_at}
+                for key in dirty
+                if key in self._holds
+                for quantity, expires_at in (self._holds[key],)
+            ]
+        if not dirty:
+            return
+        table = StockReservation.__table__
+        keys = list(dirty)
+        try:
+            for start in range(0, len(keys), _PERSIST_CHUNK):
+                chunk = keys[start:start + _PERSIST_CHUNK]
+                db.session.execute(
+                    table.delete().where(tuple_(table.c.user_id, table.c.product_id).in_(chunk))
+                )
+            if rows:
+                db.session.execute(table.insert(), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self._dirty |= dirty
+            raise
+
+    # -------------------- Sweeper --------------------
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        app = current_app._get_current_object()
+        self.load()
+        self._thread = threading.Thread(
+            target=self._run, args=(app,), name="reservation-sweeper", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop, app)
+
+    def sweep(self):
+        self.expire()
+        self.forget_stock()
+        self.flush()
+
+    def _run(self, app):
+        while not self._stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    self.sweep()
+                except Exception:
+                    app.logger.exception("Reservation sweep failed")
+                finally:
+                    db.session.remove()
+
+    def stop(self, app):
+        """Stop the sweeper and persist the ledger one last time."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception("Could not persist reservations")
+            finally:
+                db.session.remove()
+
+
+@event.listens_for(db.session, "after_commit", insert=True)
+def _apply(session):
+    # Runs before server/changes.py announces the commit, so the products
+    # this transaction wrote are still in session.info
+    session.info.pop("reservation_undo", None)
+    conversions = session.info.pop("reservation_conversions", ())
+    releases = session.info.pop("reservation_releases", ())
+    ledger = current_app.extensions.get("reservations") if has_app_context() else None
+
+    changed = session.info.get("changed_rows", {}).get("products")
+    if ledger is not None and changed is not None:
+        converted = {key[1] for _, key, _ in conversions}
+        # An empty set means "products changed, ids unknown"
+        ledger.forget_stock(changed - converted if changed else None)
+    for owner, key, quantity in conversions:
+        owner._converted(key, quantity)
+    for owner, user_id, product_ids in releases:
+        owner.release(user_id, product_ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _undo(session):
+    session.info.pop("reservation_releases", None)
+    for owner, key, _ in session.info.pop("reservation_conversions", ()):
+        # The decrement failed, so the snapshot was likely stale
+        owner.forget_stock([key[1]])
+    for owner, key, previous in reversed(session.info.pop("reservation_undo", ())):
+        owner.restore(*key, previous)
+
+
+class ReservingCartStore:
+    """Wraps a cart store so every cart line holds its quantity in the ledger."""
+
+    def __init__(self, store, ledger):
+        self.store = store
+        self.ledger = ledger
+
+    def __getattr__(self, name):
+        # contents, quantities and owner are the wrapped store's
+        return getattr(self.store, name)
+
+    def add(self, user_id, product_id, quantity):
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            raise CartError(unavailable(None)) from None
+        current = self.store.quantities(user_id).get(product_id, 0)
+        previous = self.ledger.hold(user_id, product_id, current + quantity)
+        try:
+            return self.store.add(user_id, product_id, quantity)
+        except CartError:
+            self.ledger.restore(user_id, product_id, previous)
+            raise
+
+    def add_many(self, user_id, quantities):
+        current = self.store.quantities(user_id)
+        held = {}
+        failures = []
+        for product_id in sorted(quantities):
+            try:
+                held[product_id] = self.ledger.hold(
+                    user_id, product_id, current.get(product_id, 0) + quantities[product_id]
+                )
+            except CartError as e:
+                failures.append({"product_id": product_id, "error": e.message})
+        if not held:
+            return [], failures
+
+        lines, store_failures = self.store.add_many(user_id, {pid: quantities[pid] for pid in held})
+        for failure in store_failures:
+            self.ledger.restore(user_id, failure["product_id"], held[failure["product_id"]])
+        return lines, sorted(failures + store_failures, key=lambda f: f["product_id"])
+
+    def update(self, item_id, quantity):
+        owner = self.store.owner(item_id)
+        if owner is None:
+            raise CartError("Cart item not found", 404)
+        previous = self.ledger.hold(*owner, quantity)
+        try:
+            return self.store.update(item_id, quantity)
+        except CartError:
+            self.ledger.restore(*owner, previous)
+            raise
+
+    def remove(self, item_id):
+        owner = self.store.owner(item_id)
+        removed = self.store.remove(item_id)
+        if removed and owner is not None:
+            _stage("reservation_releases", (self.ledger, owner[0], [owner[1]]))
+        return removed
+
+    def clear(self, user_id, product_ids=None):
+        self.store.clear(user_id, product_ids)
+        _stage("reservation_releases", (self.ledger, user_id, product_ids))
+
+
+class Reservations:
+    """Sets up the ledger for an app and answers for the current app's one."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Call after ``cart_store.init_app``; the app's cart store gets wrapped."""
+        enabled = app.config.setdefault("RESERVATIONS_ENABLED", False)
+        ttl = app.config.setdefault("RESERVATION_TTL", 900)
+        interval = app.config.setdefault("RESERVATION_SWEEP_SECONDS", 5)
+        if not enabled:
+            app.extensions["reservations"] = None
+            return
+        ledger = ReservationLedger(ttl, interval)
+        app.extensions["reservations"] = ledger
+        app.extensions["cart_store"] = ReservingCartStore(app.extensions["cart_store"], ledger)
+
+    @property
+    def ledger(self):
+        return current_app.extensions.get("reservations")
+
+    def convert(self, user_id, quantities):
+        """See ``ReservationLedger.convert``; nothing is short when disabled."""
+        ledger = self.ledger
+        return ledger.convert(user_id, quantities) if ledger is not None else {}
+
+
+reservations = Reservations()
@@ -0,0 +1,111 @@
+# server/routing.py
+"""Send read-only routes to replica databases.
+
+Views marked ``@read_only`` have their queries routed to a randomly chosen
+replica engine (the ``replica_*`` binds). Everything else, and anything that
+writes, goes to the primary. A client that has just written is kept on the
+primary for ``REPLICA_STICKY_SECONDS`` so it always reads its own writes.
+
+A write sets a signed, short-lived cookie, so every worker keeps that
+client on the primary. Clients that drop cookies are also remembered by
+acting user id, in this process only. The client address is never used:
+everyone behind one NAT would be pinned to the primary by any one write.
+"""
+import functools
+import math
+import random
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_PREFIX = "replica_"
+STICKY_COOKIE = "primary_sticky"
+
+_sticky = {}  # acting user id -> time.monotonic() the pin ends
+_sticky_lock = threading.Lock()
+
+
+def _window():
+    return current_app.config.get("REPLICA_STICKY_SECONDS", 5)
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt="primary-sticky")
+
+
+def stick_to_primary():
+    """Pin the current client to the primary for REPLICA_STICKY_SECONDS."""
+    if not has_request_context():
+        return
+    g.stick_to_primary = True
+    user_id = g.get("acting_user_id")
+    if user_id is None:
+        return
+    until = time.monotonic() + _window()
+    with _sticky_lock:
+        _sticky[user_id] = until
+        # Keep the map from growing without bound
+        if len(_sticky) > 10000:
+            now = time.monotonic()
+            for key in [k for k, v in _sticky.items() if v < now]:
+                del _sticky[key]
+
+
+def is_sticky():
+    cookie = request.cookies.get(STICKY_COOKIE)
+    if cookie:
+        try:
+            _serializer().loads(cookie, max_age=_window())
+            return True
+        except BadSignature:
+            pass
+    user_id = g.get("acting_user_id")
+    if user_id is None:
+        return False
+    with _sticky_lock:
+        return _sticky.get(user_id, 0) > time.monotonic()
+
+
+def _set_sticky_cookie(response):
+    if g.get("stick_to_primary"):
+        response.set_cookie(
+            STICKY_COOKIE, _serializer().dumps(True),
+            max_age=math.ceil(_window()), httponly=True, samesite="Lax",
+        )
+    return response
+
+
+def install_sticky_cookie(app):
+    """Send the primary-sticky cookie on responses to writes."""
+    app.after_request(_set_sticky_cookie)
+
+
+def read_only(view):
+    """Allow this view's queries to be served by a read replica."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and has_request_context()
+            and g.get("read_only")
+        ):
+            replicas = [
+                engine for key, engine in self._db.engines.items()
+                if key and key.startswith(REPLICA_PREFIX)
+            ]
+            if replicas and not is_sticky():
+                return random.choice(replicas)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,136 @@
+# server/search.py
+"""Full-text product search on an SQLite FTS5 index.
+
+``products_fts`` is an external-content FTS5 table over the ``products`` name,
+description, brand and category columns. Triggers keep it in sync, so Core
+bulk statements are indexed as well as ORM writes. The update trigger only
+fires when one of the indexed columns changes, which keeps stock decrements
+at checkout off the index.
+
+Results are ranked with BM25, with name matches counting most. Every search
+term is matched as a prefix ("wire mou" finds "Wireless Mouse"). Pages use
+a keyset cursor on ``(rank, id)`` just like the listing.
+"""
+import re
+
+from sqlalchemy import column, event, func, literal_column, table, tuple_
+
+from .listing import (
+    DEFAULT_LIMIT, FIELDS, MAX_LIMIT, ListingError, decode_cursor, encode_cursor,
+    serialize_rows, _parse_fields, _parse_number,
+)
+from .models import db, Product
+
+# BM25 weight per indexed column: name, description, brand, category
+WEIGHTS = (10.0, 1.0, 5.0, 3.0)
+
+DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, brand, category,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description, brand, category)
+        VALUES (new.id, new.name, new.description, new.brand, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+        VALUES ('delete', old.id, old.name, old.description, old.brand, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF name, description, brand, category ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+        VALUES ('delete', old.id, old.name, old.description, old.brand, old.category);
+        INSERT INTO products_fts (rowid, name, description, brand, category)
+        VALUES (new.id, new.name, new.description, new.brand, new.category);
+    END
+    """,
+]
+
+# Bulk imports drop this trigger for the length of a batch and index the
+# batch with index_range instead (see server/bulk.py)
+INSERT_TRIGGER = ("products_fts_insert", DDL[1])
+
+_fts = table("products_fts", column("rowid"))
+_match_target = literal_column("products_fts")
+_rank = func.bm25(_match_target, *WEIGHTS)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+@event.listens_for(Product.__table__, "after_create")
+def _create_index(target, connection, **kw):
+    # Databases built with db.create_all() get the index too; migrations
+    # create it for everything else.
+    if connection.dialect.name == "sqlite":
+        for statement in DDL:
+            connection.exec_driver_sql(statement)
+
+
+def index_range(connection, first_id, last_id):
+    """Index the products with ids ``first_id..last_id`` in one statement."""
+    connection.exec_driver_sql(
+        "INSERT INTO products_fts (rowid, name, description, brand, category) "
+        "SELECT id, name, description, brand, category FROM products WHERE id BETWEEN ? AND ?",
+        (first_id, last_id),
+    )
+
+
+def match_expression(q):
+    """Turn free text into an FTS5 query: every word, as a prefix, ANDed.
+
+    Words are quoted, so FTS5 operators and punctuation in user input are
+    matched literally instead of being parsed as query syntax.
+    """
+    terms = _TERM.findall(q or "")
+    if not terms:
+        raise ListingError("Missing search query")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_products(args):
+    """One page of products matching ``?q=``, best match first.
+
+    Returns ``(items, next_cursor)`` like ``list_products``.
+    """
+    match = match_expression(args.get("q"))
+    fields = _parse_fields(args)
+    limit = _parse_number(args, "limit", int)
+    if limit is None:
+        limit = DEFAULT_LIMIT
+    if limit < 1:
+        raise ListingError("Invalid limit")
+    limit = min(limit, MAX_LIMIT)
+
+    # Rank and page inside the index first, then join only the page's rows
+    hits = db.select(_fts.c.rowid.label("id"), _rank.label("rank")).where(
+        _match_target.op("MATCH")(match)
+    )
+    cursor = args.get("cursor")
+    if cursor:
+        hits = hits.where(tuple_(_rank, _fts.c.rowid) > decode_cursor(cursor, "rank"))
+    hits = hits.order_by(_rank, _fts.c.rowid).limit(limit + 1).subquery()
+
+    selected = list(dict.fromkeys(fields + ["id"]))
+    query = (
+        db.select(*(FIELDS[f].label(f) for f in selected), hits.c.rank)
+        .join(hits, Product.id == hits.c.id)
+        .order_by(hits.c.rank, Product.id)
+    )
+
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.rank, last.id)
+
+    return serialize_rows(rows, fields), next_cursor
@@ -3,7 +3,7 @@ from .app import create_app
 from .models import db, User, Product
 import random
 
-app = create_app()
+app = create_app({"DEBUG": True})  # local seeding only
 
 with app.app_context():
     # Reset database
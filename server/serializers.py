@@ -0,0 +1,56 @@
+# server/serializers.py
+"""Fast JSON encoding for API responses.
+
+Uses orjson when it is installed and falls back to the stdlib json module
+otherwise. Either way datetimes are written as ISO 8601, so read paths can
+hand over plain dicts built straight from ``Row`` objects without calling
+``isoformat()`` per row.
+"""
+import json
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys=False):
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, separators=(",", ":"))
+
+
+def loads(s):
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+def row_dict(row, fields=None):
+    """A dict from a column-projected ``Row``, optionally limited to ``fields``."""
+    mapping = row._mapping
+    if fields is None:
+        return dict(mapping)
+    return {field: mapping[field] for field in fields}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by :func:`dumps`; installed on ``app.json``."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.pop("sort_keys", self.sort_keys))
+
+    def loads(self, s, **kwargs):
+        return loads(s)
@@ -0,0 +1,268 @@
+# server/stock_shards.py
+"""Sharded stock counters for hot products.
+
+Every checkout of a best seller updates the same ``products`` row, so all
+of its buyers queue on that row's lock. A sharded product keeps its stock
+in N rows of ``product_stock_shards`` instead, and each checkout decrements
+a shard picked at random. Concurrent buyers then mostly write different
+rows. A line that no single shard can fill is taken across shards.
+
+Sharding is per product and opt-in:
+
+    flask --app server.app:create_app products shard-stock 42 --shards 8
+    flask --app server.app:create_app products unshard-stock 42
+
+The sum of a sharded product's shards is its real stock. Product reads
+(detail, listings, search and ``Product.to_dict``) show that sum, cached
+for ``STOCK_TOTAL_TTL`` seconds. ``products.stock``, which facets and the
+price and stock filters read, is copied from the sums by a background sync
+every ``STOCK_SYNC_SECONDS``, and right after a checkout fails for lack
+of sharded stock. Checkouts never write the hot products row themselves.
+The column only ever runs ahead of the shards, and the shard decrement is
+conditional, so the lag can never oversell.
+
+The gain needs a database with row-level locks. SQLite takes one write lock
+for the whole database, so there sharding only adds statements; see
+benchmarks/stock_contention.py.
+
+Config:
+    STOCK_SHARDING_ENABLED   route checkouts of sharded products to their shards (default False)
+    STOCK_SYNC_SECONDS       how often products.stock is synced from the shards (default 1)
+    STOCK_TOTAL_TTL          how long a summed total is cached for display (default 1)
+
+Unshard every product before turning STOCK_SHARDING_ENABLED off again.
+"""
+import random
+import threading
+import time
+
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, func
+
+from .bulk import products_cli
+from .changes import mark_changed
+from .models import db, Product, StockShard
+
+DEFAULT_SHARDS = 8
+
+_shards = StockShard.__table__
+_take = (
+    _shards.update()
+    .where(
+        _shards.c.product_id == bindparam("product"),
+        _shards.c.shard == bindparam("slot"),
+        _shards.c.stock >= bindparam("quantity"),
+    )
+    .values(stock=_shards.c.stock - bindparam("quantity"))
+)
+_products = Product.__table__
+_shard_total = (
+    db.select(func.sum(_shards.c.stock))
+    .where(_shards.c.product_id == _products.c.id)
+    .scalar_subquery()
+)
+
+_lock = threading.Lock()
+_totals = {}  # product_id -> (total or None, expires)
+MAX_CACHED_TOTALS = 10000
+
+
+def _enabled():
+    return has_app_context() and current_app.config.get("STOCK_SHARDING_ENABLED", False)
+
+
+def _sums(product_ids):
+    return dict(db.session.execute(
+        db.select(StockShard.product_id, func.sum(StockShard.stock))
+        .where(StockShard.product_id.in_(product_ids))
+        .group_by(StockShard.product_id)
+    ).all())
+
+
+# -------------------- Reads --------------------
+def shard_counts(product_ids):
+    """``{product_id: shard count}`` for the sharded ones among ``product_ids``."""
+    if not product_ids or not _enabled():
+        return {}
+    return dict(db.session.execute(
+        db.select(StockShard.product_id, func.count())
+        .where(StockShard.product_id.in_(product_ids))
+        .group_by(StockShard.product_id)
+    ).all())
+
+
+def shard_totals(product_ids):
+    """``{product_id: summed stock}`` for the sharded ones, read fresh."""
+    if not product_ids or not _enabled():
+        return {}
+    return _sums(product_ids)
+
+
+def current_stock(product_ids):
+    """``{product_id: stock}`` for the sharded ones, from briefly cached shard sums."""
+    if not product_ids or not _enabled():
+        return {}
+    now = time.monotonic()
+    with _lock:
+        cached = {pid: _totals.get(pid) for pid in product_ids}
+    stale = [pid for pid, entry in cached.items() if entry is None or entry[1] < now]
+    if stale:
+        sums = _sums(stale)
+        expires = now + current_app.config.get("STOCK_TOTAL_TTL", 1)
+        with _lock:
+            for pid in stale:
+                cached[pid] = _totals[pid] = (sums.get(pid), expires)
+            # Keep the map from growing without bound
+            if len(_totals) > MAX_CACHED_TOTALS:
+                for pid in [k for k, (_, until) in _totals.items() if until < now]:
+                    del _totals[pid]
+    return {pid: total for pid, (total, _) in cached.items() if total is not None}
+
+
+def display_stock(product):
+    """The stock to show for ``product``: the cached shard sum if it has shards."""
+    return current_stock([product.id]).get(product.id, product.stock)
+
+
+# -------------------- Sync --------------------
+def sync(product_ids=None):
+    """Copy shard sums into ``products.stock`` where they differ, and commit.
+
+    Covers every sharded product for None. Returns the ids that changed.
+    """
+    if not _enabled():
+        return []
+    sharded = db.select(_shards.c.product_id)
+    if product_ids is not None:
+        sharded = sharded.where(_shards.c.product_id.in_(product_ids))
+    changed = db.session.scalars(
+        _products.update()
+        .where(_products.c.id.in_(sharded), _products.c.stock.is_distinct_from(_shard_total))
+        .values(stock=_shard_total)
+        .returning(_products.c.id)
+    ).all()
+    if changed:
+        mark_changed(db.session, "products", changed)
+    db.session.commit()
+    return changed
+
+
+def _sync_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                sync()
+            except Exception:
+                app.logger.exception("Stock shard sync failed")
+            finally:
+                db.session.remove()
+
+
+def _ensure_syncing():
+    """Start this app's background sync, once."""
+    app = current_app._get_current_object()
+    if "stock_shard_sync" in app.extensions:
+        return
+    with _lock:
+        if "stock_shard_sync" in app.extensions:
+            return
+        thread = threading.Thread(
+            target=_sync_loop, args=(app, app.config.get("STOCK_SYNC_SECONDS", 1)),
+            name="stock-shard-sync", daemon=True,
+        )
+        app.extensions["stock_shard_sync"] = thread
+    thread.start()
+
+
+# -------------------- Decrements --------------------
+def _take_spread(product_id, quantity):
+    """Take ``quantity`` across several shards; False if they hold too little."""
+    rows = db.session.execute(
+        db.select(StockShard.shard, StockShard.stock)
+        .where(StockShard.product_id == product_id, StockShard.stock > 0)
+    ).all()
+    if sum(stock for _, stock in rows) < quantity:
+        return False
+    remaining = quantity
+    for shard, stock in rows:
+        take = min(stock, remaining)
+        result = db.session.execute(_take, {"product": product_id, "slot": shard, "quantity": take})
+        if result.rowcount != 1:
+            return False  # raced with another buyer; the caller rolls back
+        remaining -= take
+        if not remaining:
+            return True
+    return False
+
+
+def take(product_id, quantity, shards):
+    """Conditionally take ``quantity`` units from a sharded product.
+
+    Shards are tried starting from a random one, so concurrent buyers spread
+    over the rows. Returns False if the stock is not there; the caller must
+    roll back, since a spread take may have decremented some shards.
+    """
+    _ensure_syncing()
+    start = random.randrange(shards)
+    for offset in range(shards):
+        params = {"product": product_id, "slot": (start + offset) % shards, "quantity": quantity}
+        if db.session.execute(_take, params).rowcount == 1:
+            return True
+    return _take_spread(product_id, quantity)
+
+
+# -------------------- Sharding --------------------
+def shard_product(product_id, shards=DEFAULT_SHARDS):
+    """Split a product's stock over ``shards`` rows; resharding keeps the total."""
+    product = db.session.get(Product, product_id)
+    if product is None:
+        raise ValueError(f"Product {product_id} not found")
+    total = _sums([product_id]).get(product_id, product.stock or 0)
+    db.session.execute(_shards.delete().where(_shards.c.product_id == product_id))
+    base, extra = divmod(total, shards)
+    db.session.execute(_shards.insert(), [
+        {"product_id": product_id, "shard": shard, "stock": base + (shard < extra)}
+        for shard in range(shards)
+    ])
+    product.stock = total
+    db.session.commit()
+    return total
+
+
+def unshard_product(product_id):
+    """Fold a product's shards back into ``products.stock``."""
+    product = db.session.get(Product, product_id)
+    if product is None:
+        raise ValueError(f"Product {product_id} not found")
+    total = _sums([product_id]).get(product_id)
+    if total is not None:
+        product.stock = total
+        db.session.execute(_shards.delete().where(_shards.c.product_id == product_id))
+    mark_changed(db.session, "products", [product_id])
+    db.session.commit()
+    return product.stock
+
+
+@products_cli.command("shard-stock")
+@click.argument("product_id", type=int)
+@click.option("--shards", default=DEFAULT_SHARDS, show_default=True, type=click.IntRange(1))
+def shard_command(product_id, shards):
+    """Keep a hot product's stock in sharded counters."""
+    try:
+        total = shard_product(product_id, shards)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Product {product_id}: {total} in stock over {shards} shards")
+
+
+@products_cli.command("unshard-stock")
+@click.argument("product_id", type=int)
+def unshard_command(product_id):
+    """Move a product's stock back into products.stock."""
+    try:
+        total = unshard_product(product_id)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Product {product_id}: {total} in stock")
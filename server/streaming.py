@@ -0,0 +1,37 @@
+# server/streaming.py
+"""Stream large JSON arrays instead of building them in memory.
+
+Rows are pulled from the database in batches (``yield_per``) and each one is
+serialized and written as soon as it arrives, so peak memory stays flat and
+the first bytes go out before the last row has been read.
+"""
+from flask import current_app, stream_with_context
+
+from .metrics import record_rows
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(items, dumps):
+    """Yield the JSON text of ``[item, ...]`` in chunks of about CHUNK_SIZE."""
+    buffer = ["["]
+    size = 1
+    count = 0
+    for item in items:
+        part = dumps(item) if not count else "," + dumps(item)
+        count += 1
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    buffer.append("]")
+    record_rows(count)
+    yield "".join(buffer)
+
+
+def stream_json(items):
+    """A streaming JSON array response over an iterable of dicts."""
+    generate = iter_json_array(items, current_app.json.dumps)
+    return current_app.response_class(stream_with_context(generate), mimetype="application/json")
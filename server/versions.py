@@ -0,0 +1,83 @@
+# server/versions.py
+"""Version stamps and ETags for conditional GETs.
+
+Every write bumps a counter in ``table_versions`` for the scopes it touched
+("products" for any product, "orders:<user_id>" for a user's orders) inside
+the same transaction. GET routes turn the counter into a strong ETag and can
+answer ``If-None-Match`` with 304 after one primary-key lookup, before any
+rows are read or serialized.
+"""
+import hashlib
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from .changes import pending_changes
+from .models import db, Product, Order, TableVersion
+
+_versions = TableVersion.__table__
+
+
+def current_version(scope):
+    version = db.session.query(TableVersion.version).filter_by(scope=scope).scalar()
+    return version or 0
+
+
+def make_etag(scope, version, representation=""):
+    digest = hashlib.blake2b(representation.encode("utf-8"), digest_size=6).hexdigest()
+    return f"{scope}-{version}-{digest}"
+
+
+def conditional(scope):
+    """ETag for the current request under ``scope``, and a 304 if it matches.
+
+    Returns ``(etag, version, response)``; ``response`` is None when the
+    client's copy is stale and the caller should build the full body. Bodies
+    cached for the ETag must be keyed by ``version`` as well.
+    """
+    version = current_version(scope)
+    etag = make_etag(scope, version, request.full_path)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return etag, version, response
+    return etag, version, None
+
+
+def _scopes(session):
+    return session.info.setdefault("version_scopes", set())
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_scopes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            _scopes(session).add("products")
+        elif isinstance(obj, Order):
+            _scopes(session).add(f"orders:{obj.user_id}")
+
+
+@event.listens_for(db.session, "before_commit")
+def _bump_versions(session):
+    session.flush()
+    scopes = session.info.pop("version_scopes", set())
+    # Bulk statements that bypass the ORM report through mark_changed
+    if "products" in pending_changes(session):
+        scopes.add("products")
+    if not scopes:
+        return
+
+    connection = session.connection()
+    for scope in sorted(scopes):
+        bumped = connection.execute(
+            _versions.update()
+            .where(_versions.c.scope == scope)
+            .values(version=_versions.c.version + 1)
+        )
+        if bumped.rowcount == 0:
+            connection.execute(_versions.insert().values(scope=scope, version=1))
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard(session):
+    session.info.pop("version_scopes", None)
@@ -0,0 +1,89 @@
+# tests/conftest.py
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from server.app import create_app
+from server.auth import user_cache
+from server.models import db, User, Product
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite file; extra config overrides the defaults."""
+    apps = []
+
+    def factory(name="test.db", **config):
+        user_cache.clear()
+        app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / name}",
+            "BCRYPT_LOG_ROUNDS": 4,
+            "PASSWORD_POOL_WORKERS": 0,
+            **config,
+        })
+        with app.app_context():
+            db.create_all(bind_key=None)  # replicas are copied from the primary
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    def factory(username, password="password"):
+        with app.app_context():
+            user = User(username=username, email=f"{username}@example.com", password=password)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return factory
+
+
+@pytest.fixture
+def make_product(app):
+    def factory(name="Product", price=10.0, stock=10, **fields):
+        with app.app_context():
+            product = Product(name=name, price=price, stock=stock, **fields)
+            db.session.add(product)
+            db.session.commit()
+            return product.id
+    return factory
+
+
+@contextlib.contextmanager
+def _count_queries(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def count_queries():
+    """``with count_queries(app) as statements:`` collects the SQL run inside."""
+    return _count_queries
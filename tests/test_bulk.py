@@ -0,0 +1,54 @@
+# tests/test_bulk.py
+import sqlite3
+
+import pytest
+
+from server import bulk, facets, search
+from server.models import db, Product
+
+TRIGGERS = {search.INSERT_TRIGGER[0], facets.INSERT_TRIGGER[0]}
+
+
+def _triggers_seen_by_another_connection(app):
+    path = app.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+    conn = sqlite3.connect(path)
+    try:
+        return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    finally:
+        conn.close()
+
+
+def _records(count):
+    return [(line, {"name": f"Imported {line}", "price": 5, "category": "Tools"}) for line in range(count)]
+
+
+def test_import_counts_the_batch_like_the_triggers(app, client):
+    with app.app_context():
+        summary = bulk.import_products(_records(30), batch_size=20)
+    assert summary["inserted"] == 30
+    assert TRIGGERS <= _triggers_seen_by_another_connection(app)
+
+    categories = client.get("/products/facets").get_json()["category"]
+    assert categories == [{"value": "Tools", "count": 30, "in_stock": 0}]
+    assert len(client.get("/products/search?q=imported&limit=100").get_json()) == 30
+
+
+def test_failed_batch_keeps_the_triggers(app, monkeypatch):
+    seen = []
+
+    def failing_catch_up(connection, first_id, last_id):
+        seen.append(_triggers_seen_by_another_connection(app))
+        raise RuntimeError("catch-up failed")
+
+    monkeypatch.setattr(bulk, "_DEFERRED_TRIGGERS", [
+        (search.INSERT_TRIGGER, search.index_range),
+        (facets.INSERT_TRIGGER, failing_catch_up),
+    ])
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            bulk.import_products(_records(5))
+        assert db.session.scalar(db.select(db.func.count()).select_from(Product)) == 0
+
+    # Dropped only inside the batch's transaction, and back after its rollback
+    assert TRIGGERS <= seen[0]
+    assert TRIGGERS <= _triggers_seen_by_another_connection(app)
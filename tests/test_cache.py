@@ -0,0 +1,27 @@
+# tests/test_cache.py
+import sqlite3
+
+
+def _write_from_another_worker(app, product_id, name):
+    """Rename a product the way another process would: no in-process hooks."""
+    path = app.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE products SET name = ? WHERE id = ?", (name, product_id))
+        conn.execute("UPDATE table_versions SET version = version + 1 WHERE scope = 'products'")
+    conn.close()
+
+
+def test_cached_bodies_follow_other_workers_writes(app, client, make_product):
+    product_id = make_product(name="Old name")
+    first = client.get(f"/products/{product_id}")
+    listing = client.get("/products")
+    assert first.get_json()["name"] == "Old name"
+    assert client.get(f"/products/{product_id}").get_json()["name"] == "Old name"
+
+    _write_from_another_worker(app, product_id, "New name")
+
+    second = client.get(f"/products/{product_id}")
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.get_json()["name"] == "New name"
+    assert client.get("/products").get_json()[0]["name"] == "New name"
+    assert client.get("/products", headers={"If-None-Match": listing.headers["ETag"]}).status_code == 200
@@ -0,0 +1,81 @@
+# tests/test_cart.py
+import pytest
+
+from server.cart_store import cart_store
+from server.models import db, User, Product
+
+
+@pytest.fixture
+def shopper(make_user, make_product):
+    make_user("alice")
+    return make_product(stock=3)
+
+
+def test_adds_past_stock_are_rejected(client, shopper):
+    response = client.post("/cart", json={"username": "alice", "product_id": shopper, "quantity": 2})
+    assert response.status_code == 201
+
+    response = client.post("/cart", json={"username": "alice", "product_id": shopper, "quantity": 2})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Only 3 items available"
+
+    cart = client.get("/cart/alice").get_json()
+    assert [line["quantity"] for line in cart] == [2]
+
+
+@pytest.mark.parametrize("quantity", [True, False, "x", None, 0, -1])
+def test_bad_quantities_are_rejected(client, shopper, quantity):
+    response = client.post("/cart", json={"username": "alice", "product_id": shopper, "quantity": quantity})
+    assert response.status_code == 400
+    assert client.get("/cart/alice").get_json() == []
+
+    response = client.post("/cart/batch", json={
+        "username": "alice", "items": [{"product_id": shopper, "quantity": quantity}],
+    })
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def kv_app(make_app):
+    return make_app("kv.db", CART_STORE="memory")
+
+
+def test_kv_add_finds_a_line_id_while_another_add_is_mid_flight(kv_app):
+    with kv_app.app_context():
+        db.session.add_all([
+            User(username="alice", email="alice@example.com", password="password"),
+            Product(name="Widget", price=10.0, stock=5),
+        ])
+        db.session.commit()
+        store = kv_app.extensions["cart_store"]
+        # A first add that has bumped the quantity but not yet finished
+        store.kv.hincrby(store._cart_key(1), 1, 1)
+
+        line, created = cart_store.add(1, 1, 2)
+        assert (line["quantity"], created) == (3, False)
+        assert store.owner(line["id"]) == (1, 1)
+
+
+def test_kv_cart_round_trip(kv_app):
+    with kv_app.app_context():
+        db.session.add_all([
+            User(username="alice", email="alice@example.com", password="password"),
+            Product(name="Widget", price=10.0, stock=5),
+            Product(name="Gadget", price=4.0, stock=5),
+        ])
+        db.session.commit()
+    client = kv_app.test_client()
+
+    first = client.post("/cart", json={"username": "alice", "product_id": 1}).get_json()
+    again = client.post("/cart", json={"username": "alice", "product_id": 1, "quantity": 2})
+    assert again.status_code == 200 and again.get_json()["id"] == first["id"]
+    second = client.post("/cart", json={"username": "alice", "product_id": 2}).get_json()
+    assert client.post("/cart", json={"username": "alice", "product_id": 2, "quantity": 9}).status_code == 400
+
+    assert client.delete(f"/cart/{first['id']}").status_code == 200
+    assert client.delete(f"/cart/{first['id']}").status_code == 404
+    assert [line["id"] for line in client.get("/cart/alice").get_json()] == [second["id"]]
+
+    assert client.post("/checkout/alice").status_code == 201
+    assert client.get("/cart/alice").get_json() == []
+    assert client.patch(f"/cart/{second['id']}", json={"quantity": 1}).status_code == 404
@@ -0,0 +1,120 @@
+# tests/test_checkout.py
+import threading
+from collections import Counter
+
+from sqlalchemy import func, insert
+
+from server.checkout import CheckoutError, checkout_cart
+from server.database import retry_on_locked
+from server.models import db, User, Product, CartItem, OrderItem
+from server.passwords import password_hasher
+
+# A 50-line checkout: user, products, stock, order and items, cart, versions.
+# The response must not reload each line's product after the commit.
+CHECKOUT_BUDGET = 10
+
+
+def test_checkout_response_needs_no_lazy_loads(app, client, make_user, count_queries):
+    make_user("alice")
+    with app.app_context():
+        db.session.execute(insert(Product), [
+            {"name": f"Product {i}", "price": 5.0, "stock": 10, "image_url": f"/img/{i}.png"}
+            for i in range(50)
+        ])
+        db.session.commit()
+        product_ids = db.session.scalars(db.select(Product.id)).all()
+    items = [{"product_id": product_id, "quantity": 2} for product_id in product_ids]
+    assert client.post("/cart/batch", json={"username": "alice", "items": items}).status_code == 200
+
+    with count_queries(app) as statements:
+        response = client.post("/checkout/alice")
+
+    assert response.status_code == 201, response.get_json()
+    order = response.get_json()
+    assert order["total"] == 500.0
+    assert len(order["items"]) == 50
+    assert len({item["id"] for item in order["items"]}) == 50
+    assert order["items"][0]["image_url"] == "/img/0.png"
+    assert len(statements) <= CHECKOUT_BUDGET, statements
+
+
+def _make_buyers(app, count):
+    with app.app_context():
+        password_hash = password_hasher.hash("password")
+        db.session.execute(insert(User), [
+            {"username": f"buyer{i}", "email": f"buyer{i}@example.com", "_password_hash": password_hash}
+            for i in range(count)
+        ])
+        db.session.commit()
+        return db.session.scalars(db.select(User.id).order_by(User.id)).all()
+
+
+def _sold_and_left(app, product_id):
+    with app.app_context():
+        sold = db.session.scalar(db.select(func.coalesce(func.sum(OrderItem.quantity), 0)))
+        return sold, db.session.get(Product, product_id).stock
+
+
+def test_concurrent_checkouts_never_oversell(app, make_product):
+    buyers, stock = 30, 10
+    user_ids = _make_buyers(app, buyers)
+    product_id = make_product(name="Flash sale console", stock=stock)
+    with app.app_context():
+        db.session.execute(insert(CartItem), [
+            {"user_id": user_id, "product_id": product_id, "quantity": 1} for user_id in user_ids
+        ])
+        db.session.commit()
+
+    outcomes = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(buyers)
+    checkout = retry_on_locked(checkout_cart)
+
+    def buy(user_id):
+        with app.app_context():
+            barrier.wait()
+            try:
+                checkout(user_id)
+                outcome = "ordered"
+            except CheckoutError as e:
+                outcome = e.status
+            finally:
+                db.session.remove()
+        with lock:
+            outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=buy, args=(user_id,)) for user_id in user_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes == {"ordered": stock, 400: buyers - stock}
+    assert _sold_and_left(app, product_id) == (stock, 0)
+
+
+def test_concurrent_orders_never_oversell(app, make_product):
+    buyers, stock = 30, 10
+    _make_buyers(app, buyers)
+    product_id = make_product(name="Flash sale console", stock=stock)
+
+    statuses = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(buyers)
+
+    def buy(index):
+        client = app.test_client()
+        body = {"username": f"buyer{index}", "items": [{"product_id": product_id, "quantity": 1}]}
+        barrier.wait()
+        response = client.post("/orders", json=body)
+        with lock:
+            statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=buy, args=(i,)) for i in range(buyers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses == {200: stock, 400: buyers - stock}
+    assert _sold_and_left(app, product_id) == (stock, 0)
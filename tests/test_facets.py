@@ -0,0 +1,22 @@
+# tests/test_facets.py
+from sqlalchemy import insert
+
+from server.models import db, Product
+
+
+def test_price_buckets_match_the_listing_filter(app, client):
+    prices = [10, 24.99, 25, 49.5, 50, 100, 999.99, 1000, 2500]
+    with app.app_context():
+        db.session.execute(insert(Product), [
+            {"name": f"Product {price}", "price": price, "stock": 1} for price in prices
+        ])
+        db.session.commit()
+
+    buckets = client.get("/products/facets").get_json()["price"]
+    assert sum(bucket["count"] for bucket in buckets) == len(prices)
+    for bucket in buckets:
+        params = {"min_price": bucket["min_price"], "limit": 100}
+        if bucket["price_lt"] is not None:
+            params["price_lt"] = bucket["price_lt"]
+        listed = client.get("/products", query_string=params).get_json()
+        assert len(listed) == bucket["count"], bucket
@@ -0,0 +1,69 @@
+# tests/test_idempotency.py
+import time
+
+import pytest
+
+from server import idempotency
+from server.idempotency import HEADER, REPLAYED_HEADER
+
+
+@pytest.fixture
+def buyers(make_user, make_product):
+    make_user("alice")
+    make_user("bob")
+    return make_product(stock=10)
+
+
+def _order(client, username, product_id, key):
+    body = {"username": username, "items": [{"product_id": product_id, "quantity": 1}]}
+    return client.post("/orders", json=body, headers={HEADER: key})
+
+
+def test_retry_replays_the_stored_response(client, buyers):
+    first = _order(client, "alice", buyers, "retry-1")
+    retry = _order(client, "alice", buyers, "retry-1")
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert retry.get_json()["order_id"] == first.get_json()["order_id"]
+
+
+def test_keys_are_scoped_to_the_acting_user(client, buyers):
+    alice = _order(client, "alice", buyers, "shared-key")
+    bob = _order(client, "bob", buyers, "shared-key")
+    assert alice.status_code == bob.status_code == 200
+    assert REPLAYED_HEADER not in bob.headers
+    assert bob.get_json()["order_id"] != alice.get_json()["order_id"]
+
+
+def test_unfinished_claim_is_released_after_its_lease(make_app, monkeypatch):
+    app = make_app("lease.db", IDEMPOTENCY_LEASE=0.2)
+    client = app.test_client()
+    client.post("/signup", json={"username": "alice", "email": "alice@example.com", "password": "pw"})
+    product_id = client.post("/products", json={"name": "P", "price": 5, "stock": 10}).get_json()["id"]
+
+    # The worker dies after the view ran, before its response was stored
+    with monkeypatch.context() as patch:
+        patch.setattr(idempotency, "_store", lambda key, token, response: None)
+        _order(client, "alice", product_id, "crashed")
+
+    assert _order(client, "alice", product_id, "crashed").status_code == 409
+    time.sleep(0.3)
+    retry = _order(client, "alice", product_id, "crashed")
+    assert retry.status_code == 200
+    assert REPLAYED_HEADER not in retry.headers
+
+
+def test_request_that_outlived_its_lease_cannot_touch_the_new_claim(make_app):
+    app = make_app("takeover.db", IDEMPOTENCY_LEASE=0.2)
+    with app.app_context():
+        slow, _ = idempotency._claim("1 POST /orders k", "body")
+        time.sleep(0.3)
+        retry, _ = idempotency._claim("1 POST /orders k", "body")
+        assert slow and retry and retry != slow
+
+        # The slow request finishes last; neither write may land on the retry's claim
+        idempotency._release("1 POST /orders k", slow)
+        idempotency._store("1 POST /orders k", slow, app.response_class("slow", status=200))
+        idempotency._store("1 POST /orders k", retry, app.response_class("retry", status=200))
+        _, stored = idempotency._claim("1 POST /orders k", "body")
+        assert stored.body == "retry"
@@ -0,0 +1,63 @@
+# tests/test_listing.py
+import pytest
+from sqlalchemy import insert
+
+from server.models import db, Product
+
+
+@pytest.fixture
+def catalog(app):
+    rows = [
+        {"name": f"Product {i}", "price": 10 + i, "category": f"Category {i % 2}",
+         "brand": f"Brand {i % 3}", "stock": 5}
+        for i in range(7)
+    ]
+    with app.app_context():
+        db.session.execute(insert(Product), rows)
+        db.session.commit()
+    return rows
+
+
+def _pages(client, query):
+    """Follow X-Next-Cursor from the first page to the last."""
+    items, cursor = [], None
+    while True:
+        url = f"/products?{query}" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        items.extend(response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return items
+
+
+def test_cursor_pages_cover_the_catalog_once(client, catalog):
+    items = _pages(client, "limit=2&sort=-price")
+    prices = [item["price"] for item in items]
+    assert prices == sorted((row["price"] for row in catalog), reverse=True)
+    assert len({item["id"] for item in items}) == len(catalog)
+
+
+def test_filters_and_projection(client, catalog):
+    items = _pages(client, "limit=2&sort=price&category=Category%201&fields=id,price,category")
+    assert [item["price"] for item in items] == [11, 13, 15]
+    assert all(set(item) == {"id", "price", "category"} for item in items)
+
+    brands = client.get("/products?brand=Brand%200,Brand%201&sort=price").get_json()
+    assert [item["brand"] for item in brands] == ["Brand 0", "Brand 1", "Brand 0", "Brand 1", "Brand 0"]
+
+
+def test_price_bounds(client, catalog):
+    def prices(query):
+        return [item["price"] for item in client.get(f"/products?sort=price&{query}").get_json()]
+
+    # max_price is inclusive; price_lt is the exclusive bound facets hand out
+    assert prices("max_price=10") == [10]
+    assert prices("min_price=11&max_price=13") == [11, 12, 13]
+    assert prices("min_price=11&price_lt=13") == [11, 12]
+
+
+def test_bad_parameters_are_rejected(client, catalog):
+    for query in ("limit=0", "limit=-1", "limit=x", "sort=name", "fields=secret", "cursor=!!"):
+        response = client.get(f"/products?{query}")
+        assert response.status_code == 400, query
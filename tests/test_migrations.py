@@ -0,0 +1,23 @@
+# tests/test_migrations.py
+import os
+
+from flask_migrate import upgrade
+from sqlalchemy import inspect
+
+from server.app import create_app
+from server.models import db, Product
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+def test_fresh_database_upgrades_to_head(tmp_path):
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'fresh.db'}"})
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        columns = {column["name"] for column in inspect(db.engine).get_columns("products")}
+        assert set(Product.__table__.columns.keys()) <= columns
+
+        db.session.add(Product(name="Migrated", price=5, stock=2, category="Tools"))
+        db.session.commit()
+        assert db.session.get(Product, 1).stock == 2
+        db.engine.dispose()
@@ -0,0 +1,31 @@
+# tests/test_orders.py
+from sqlalchemy import insert
+
+from server.models import db, Order, OrderItem
+
+# Statements for GET /orders/<username> with up to one batch of orders:
+# the user lookup, the version read, the orders and the batch's items
+ORDER_HISTORY_BUDGET = 4
+
+
+def test_order_history_query_budget(app, client, make_user, make_product, count_queries):
+    user_id = make_user("alice")
+    product_ids = [make_product(name=f"Product {i}") for i in range(5)]
+    with app.app_context():
+        db.session.execute(insert(Order), [
+            {"id": order_id, "user_id": user_id, "total": 20.0} for order_id in range(1, 501)
+        ])
+        db.session.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": product_ids[order_id % 5], "quantity": 2, "price": 10.0}
+            for order_id in range(1, 501)
+        ])
+        db.session.commit()
+
+    with count_queries(app) as statements:
+        response = client.get("/orders/alice")
+        orders = response.get_json()
+
+    assert response.status_code == 200
+    assert len(orders) == 500
+    assert all(len(order["items"]) == 1 for order in orders)
+    assert len(statements) <= ORDER_HISTORY_BUDGET, statements
@@ -0,0 +1,15 @@
+# tests/test_query_plan.py
+from server.query_plan import check_routes, full_scans
+
+
+def test_routes_answer_without_full_scans():
+    assert check_routes() == []
+
+
+def test_full_scans_across_sqlite_wordings():
+    tables = {"products"}
+    assert full_scans(["SCAN products"], tables) == ["products"]
+    assert full_scans(["SCAN TABLE products"], tables) == ["products"]
+    assert full_scans(["SCAN products USING COVERING INDEX ix_products_price"], tables) == []
+    assert full_scans(["SCAN TABLE products USING INDEX ix_products_created_at"], tables) == []
+    assert full_scans(["SEARCH products USING INTEGER PRIMARY KEY (rowid=?)"], tables) == []
@@ -0,0 +1,82 @@
+# tests/test_routing.py
+import sqlite3
+
+import pytest
+
+from server.models import db
+from server.routing import STICKY_COOKIE
+
+
+def _snapshot(app, replica_path):
+    """Copy the primary into the replica file, which then lags behind it."""
+    path = app.config["SQLALCHEMY_DATABASE_URI"].removeprefix("sqlite:///")
+    with app.app_context():
+        db.engine.dispose()
+    source, target = sqlite3.connect(path), sqlite3.connect(replica_path)
+    source.backup(target)
+    source.close()
+    target.close()
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(
+        "primary.db",
+        DATABASE_REPLICA_URLS=[f"sqlite:///{tmp_path / 'replica.db'}"],
+        REPLICA_STICKY_SECONDS=30,
+    )
+
+
+@pytest.fixture
+def snapshot(app, tmp_path):
+    return lambda: _snapshot(app, tmp_path / "replica.db")
+
+
+def test_reads_go_to_the_replica(app, snapshot, make_product):
+    snapshot()
+    make_product(name="Only on the primary")
+
+    response = app.test_client().get("/products/1")
+    assert response.status_code == 404
+
+
+def test_writer_reads_its_own_writes_through_the_cookie(app, snapshot):
+    snapshot()
+    writer = app.test_client()
+    created = writer.post("/products", json={"name": "New", "price": 5, "stock": 3})
+    assert created.status_code == 201
+    assert writer.get_cookie(STICKY_COOKIE) is not None
+
+    assert writer.get("/products/1").status_code == 200
+    # Same address, different client: not pinned by someone else's write
+    assert app.test_client().get("/products/1").status_code == 404
+
+
+def test_forged_cookie_is_ignored(app, snapshot):
+    snapshot()
+    writer = app.test_client()
+    writer.post("/products", json={"name": "New", "price": 5, "stock": 3})
+
+    forger = app.test_client()
+    forger.set_cookie(STICKY_COOKIE, writer.get_cookie(STICKY_COOKIE).value + "x")
+    assert forger.get("/products/1").status_code == 404
+
+
+def test_user_stays_on_primary_without_cookies(app, snapshot, make_user, make_product):
+    make_user("alice")
+    product_id = make_product()
+    snapshot()
+
+    response = app.test_client().post("/cart", json={"username": "alice", "product_id": product_id})
+    assert response.status_code == 201
+
+    cart = app.test_client().get("/cart/alice").get_json()
+    assert [line["product_id"] for line in cart] == [product_id]
+
+
+def test_secret_key_is_required_outside_testing(monkeypatch, tmp_path):
+    from server.app import create_app
+
+    monkeypatch.delenv("SECRET_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="SECRET_KEY"):
+        create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'prod.db'}"})
@@ -0,0 +1,35 @@
+# tests/test_search.py
+import pytest
+from sqlalchemy import insert
+
+from server.models import db, Product
+
+
+@pytest.fixture
+def catalog(app):
+    rows = [{"name": f"Blue widget {i}", "price": 10 + i, "stock": 5} for i in range(5)]
+    rows.append({"name": "Red gadget", "price": 3, "stock": 5})
+    with app.app_context():
+        db.session.execute(insert(Product), rows)
+        db.session.commit()
+    return rows
+
+
+def test_search_pages_cover_every_match_once(client, catalog):
+    names, cursor = [], None
+    while True:
+        url = "/products/search?q=widget&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 2
+        names.extend(item["name"] for item in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert sorted(names) == [f"Blue widget {i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("query", ["q=widget&limit=0", "q=widget&limit=-1", "q=widget&cursor=!!", "q=%21%21"])
+def test_bad_search_parameters_are_rejected(client, catalog, query):
+    assert client.get(f"/products/search?{query}").status_code == 400
@@ -0,0 +1,66 @@
+# tests/test_stock_shards.py
+import time
+
+import pytest
+
+from server.models import db, Product
+from server.stock_shards import shard_product
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(STOCK_SHARDING_ENABLED=True, STOCK_SYNC_SECONDS=3600, STOCK_TOTAL_TTL=0)
+
+
+@pytest.fixture
+def sharded(app, make_user, make_product):
+    make_user("alice")
+    product_id = make_product(name="Hot", stock=3)
+    with app.app_context():
+        shard_product(product_id, 2)
+    return product_id
+
+
+def _buy(client, product_id, quantity=1):
+    body = {"username": "alice", "items": [{"product_id": product_id, "quantity": quantity}]}
+    return client.post("/orders", json=body)
+
+
+def _column(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock
+
+
+def test_reads_show_the_shard_sum(app, client, sharded):
+    assert _buy(client, sharded, 3).status_code == 200
+    assert _column(app, sharded) == 3  # checkouts leave the hot row alone
+
+    assert client.get(f"/products/{sharded}").get_json()["stock"] == 0
+    assert client.get("/products").get_json()[0]["stock"] == 0
+    assert client.get("/products?fields=id,stock&stream=true").get_json() == [{"id": sharded, "stock": 0}]
+
+
+def test_failed_take_syncs_the_column(app, client, sharded):
+    assert _buy(client, sharded, 3).status_code == 200
+    response = _buy(client, sharded)
+    assert response.status_code == 400
+    assert response.get_json()["failures"][0]["available"] == 0
+    assert _column(app, sharded) == 0
+
+
+def test_background_sync(make_app):
+    app = make_app("synced.db", STOCK_SHARDING_ENABLED=True, STOCK_SYNC_SECONDS=0.05)
+    with app.app_context():
+        product = Product(name="Hot", price=10, stock=5)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+        shard_product(product_id, 2)
+    client = app.test_client()
+    client.post("/signup", json={"username": "alice", "email": "alice@example.com", "password": "pw"})
+    assert _buy(client, product_id, 2).status_code == 200
+
+    deadline = time.monotonic() + 5
+    while _column(app, product_id) != 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert _column(app, product_id) == 3